@@ -0,0 +1,355 @@
+"""API điều khiển cục bộ: HTTP + WebSocket trên asyncio (chỉ dùng thư viện chuẩn).
+
+    GET  /api/devices            danh sách thiết bị và trạng thái hiện tại
+    GET  /api/devices/<id>       một thiết bị
+    POST /api/devices/<id>       {"state": true | false | "on" | "off" | "toggle"}
+    GET  /api/events             WebSocket: nhận {"type": "snapshot"} rồi {"type": "state"} mỗi lần đổi,
+                                 gửi lên {"device": "<id>", "state": ...} để điều khiển
+
+Lệnh từ API đi qua device_bus như cử chỉ (nguồn "api"); luồng Tk áp dụng, gửi tới thiết bị,
+ghi nhật ký rồi báo lại cho server qua SmartHomeApp.state_listeners.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+
+from device_state import TOGGLE
+
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+class HttpError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or REASONS.get(status, ""))
+        self.status = status
+
+
+def parse_state(value):
+    """Giá trị state trong lệnh -> bool hoặc TOGGLE, ValueError nếu không hợp lệ.
+
+    "toggle" không được tính theo bản sao trạng thái của server (có thể đã cũ): luồng Tk đảo
+    trạng thái lúc áp dụng, nên hai lệnh toggle liên tiếp không bị mất lệnh nào.
+    """
+    if isinstance(value, bool):
+        return value
+    if value == "on":
+        return True
+    if value == "off":
+        return False
+    if value == TOGGLE:
+        return TOGGLE
+    raise ValueError(f"state không hợp lệ: {value!r}")
+
+
+def encode_ws_frame(payload, opcode=OP_TEXT):
+    """Khung WebSocket server -> client (FIN, không mask)."""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+async def read_ws_frame(reader):
+    """Đọc một khung client -> server, trả về (opcode, payload)."""
+    b0, b1 = await reader.readexactly(2)
+    opcode = b0 & 0x0F
+    n = b1 & 0x7F
+    if n == 126:
+        n, = struct.unpack("!H", await reader.readexactly(2))
+    elif n == 127:
+        n, = struct.unpack("!Q", await reader.readexactly(8))
+    if n > MAX_BODY_BYTES:
+        raise HttpError(413)
+    mask = await reader.readexactly(4) if b1 & 0x80 else None
+    payload = await reader.readexactly(n)
+    if mask:
+        payload = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+class Subscriber:
+    """Một client WebSocket với hàng đợi gửi giới hạn.
+
+    Client đọc chậm làm đầy hàng đợi thì các sự kiện đang chờ bị bỏ và thay bằng
+    một snapshot đầy đủ, nên client không bao giờ giữ trạng thái sai và server
+    không phải giữ bộ nhớ không giới hạn.
+    """
+
+    def __init__(self, server, queue_size):
+        self.server = server
+        self.queue = asyncio.Queue(queue_size)
+        self.resyncs = 0
+        self.closed = False
+
+    def push(self, message):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(self.server.snapshot_message())
+            self.resyncs += 1
+
+    def close(self):
+        """Xếp khung đóng kết nối; bỏ mọi sự kiện còn chờ để sentinel không bao giờ bị đẩy ra."""
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ControlServer(threading.Thread):
+    """Server HTTP/WebSocket chạy event loop asyncio riêng trên một luồng nền.
+
+    Trạng thái thiết bị được giữ bản sao trong server (cập nhật qua listener trên luồng Tk)
+    nên các request không bao giờ đọc widget hay store của luồng Tk.
+    """
+
+    def __init__(self, app, host=API_HOST, port=API_PORT, queue_size=64, max_clients=512,
+                 idle_timeout=30.0):
+        super().__init__(name="control-api", daemon=True)
+        self.app = app
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.registry = app.registry
+        # Gọi trên luồng Tk (trước mainloop) nên đọc store trực tiếp được
+        self.states = app.get_device_states()
+        self.subscribers = set()
+        self.connections = 0
+        self.loop = None
+        self.ready = threading.Event()
+        self._shutdown = None
+        app.state_listeners.append(self.on_state_changed)
+
+    # --- Luồng Tk ---
+    def on_state_changed(self, device_id, state, source):
+        loop = self.loop
+        # Luồng server đã dừng (vd. cổng đã bị chiếm) thì loop đã đóng: không còn ai để báo
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self.broadcast, device_id, state, source)
+            except RuntimeError:
+                # Loop vừa đóng giữa lần kiểm tra và lần gọi
+                pass
+
+    # --- Event loop ---
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._shutdown = asyncio.Event()
+        server = await asyncio.start_server(self.handle_client, self.host, self.port,
+                                            limit=MAX_HEADER_BYTES, backlog=256)
+        self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        await self._shutdown.wait()
+        # Không chờ wait_closed(): các kết nối WebSocket còn mở bị hủy khi asyncio.run kết thúc
+        server.close()
+        for subscriber in list(self.subscribers):
+            subscriber.close()
+        await asyncio.sleep(0.1)
+
+    def stop(self, timeout=2.0):
+        if self.loop is not None and self._shutdown is not None:
+            self.loop.call_soon_threadsafe(self._shutdown.set)
+        if self.is_alive():
+            self.join(timeout)
+
+    def broadcast(self, device_id, state, source):
+        self.states[device_id] = state
+        message = json.dumps({"type": "state", "device": device_id, "state": state, "source": source,
+                              "t": round(time.time(), 3)}).encode("utf-8")
+        for subscriber in self.subscribers:
+            subscriber.push(message)
+
+    def device_json(self, device):
+        return {"id": device.id, "label": device.label, "gesture": device.gesture,
+                "state": self.states.get(device.id, False)}
+
+    def snapshot_message(self):
+        return json.dumps({"type": "snapshot", "devices": [self.device_json(d) for d in self.registry]},
+                          ensure_ascii=False).encode("utf-8")
+
+    def command(self, data):
+        """Áp dụng lệnh {"device", "state"} qua device_bus; trả về trạng thái mong muốn (bool hoặc "toggle")."""
+        if not isinstance(data, dict):
+            raise HttpError(400, "Cần một object JSON")
+        device_id = data.get("device")
+        if not isinstance(device_id, str):
+            raise HttpError(400, "device phải là chuỗi id thiết bị")
+        if self.registry.get(device_id) is None:
+            raise HttpError(404, f"Không có thiết bị {device_id!r}")
+        try:
+            state = parse_state(data.get("state"))
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        self.app.device_bus.publish({device_id: state}, source="api")
+        return state
+
+    async def handle_client(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, 413, {"error": REASONS[413]}, keep_alive=False)
+                    break
+                try:
+                    method, path, headers, length = self.parse_head(head)
+                except HttpError as e:
+                    # Không biết body dài bao nhiêu nên không giữ kết nối được nữa
+                    await self.respond(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                body = await asyncio.wait_for(reader.readexactly(length), self.idle_timeout) if length else b""
+                if path == "/api/events" and headers.get("upgrade", "").lower() == "websocket":
+                    await self.websocket(reader, writer, headers)
+                    break
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, payload = self.route(method, path, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, HttpError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    @staticmethod
+    def parse_head(head):
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400)
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HttpError(400, "Content-Length không hợp lệ")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413)
+        return method, path.split("?", 1)[0], headers, length
+
+    def route(self, method, path, body):
+        parts = path.strip("/").split("/")
+        if parts[:2] != ["api", "devices"] or len(parts) > 3:
+            raise HttpError(404)
+        if len(parts) == 2:
+            if method != "GET":
+                raise HttpError(405)
+            return 200, {"devices": [self.device_json(d) for d in self.registry]}
+        device = self.registry.get(parts[2])
+        if device is None:
+            raise HttpError(404, f"Không có thiết bị {parts[2]!r}")
+        if method == "GET":
+            return 200, self.device_json(device)
+        if method != "POST":
+            raise HttpError(405)
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "Body không phải JSON")
+        if not isinstance(data, dict):
+            raise HttpError(400, "Cần một object JSON")
+        state = self.command({**data, "device": device.id})
+        # 202: trạng thái được áp dụng bất đồng bộ trên luồng Tk, sự kiện "state" báo khi xong
+        return 202, {"id": device.id, "state": state}
+
+    async def respond(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key")
+        if not key:
+            await self.respond(writer, 400, {"error": "Thiếu Sec-WebSocket-Key"}, keep_alive=False)
+            return
+        if len(self.subscribers) >= self.max_clients:
+            await self.respond(writer, 503, {"error": "Quá nhiều client"}, keep_alive=False)
+            return
+        accept = base64.b64encode(hashlib.sha1(key.encode("latin-1") + WS_GUID).digest()).decode("ascii")
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                      "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("latin-1"))
+        subscriber = Subscriber(self, self.queue_size)
+        subscriber.push(self.snapshot_message())
+        self.subscribers.add(subscriber)
+        sender = asyncio.create_task(self.ws_sender(subscriber, writer))
+        try:
+            await self.ws_receiver(reader, writer, subscriber)
+        finally:
+            self.subscribers.discard(subscriber)
+            sender.cancel()
+
+    async def ws_sender(self, subscriber, writer):
+        try:
+            while True:
+                message = await subscriber.queue.get()
+                if message is None:
+                    writer.write(encode_ws_frame(b"", OP_CLOSE))
+                    await writer.drain()
+                    # Đóng kết nối để ws_receiver nhận EOF và handler kết thúc trước khi loop dừng
+                    writer.close()
+                    return
+                writer.write(encode_ws_frame(message))
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def ws_receiver(self, reader, writer, subscriber):
+        while True:
+            opcode, payload = await read_ws_frame(reader)
+            if opcode == OP_CLOSE:
+                writer.write(encode_ws_frame(payload[:2], OP_CLOSE))
+                return
+            if opcode == OP_PING:
+                writer.write(encode_ws_frame(payload, OP_PONG))
+                continue
+            if opcode != OP_TEXT:
+                continue
+            try:
+                state = self.command(json.loads(payload))
+                reply = {"type": "ack", "state": state}
+            except ValueError:
+                reply = {"type": "error", "error": "Không phải JSON"}
+            except HttpError as e:
+                reply = {"type": "error", "error": str(e)}
+            subscriber.push(json.dumps(reply, ensure_ascii=False).encode("utf-8"))
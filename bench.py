@@ -0,0 +1,279 @@
+"""Benchmark không cần camera/cửa sổ cho pipeline nhận diện.
+
+Ví dụ:
+    python -m bench                                 # ảnh tĩnh trong image/
+    python -m bench --source video.mp4 --frames 500
+    python -m bench --source synthetic --save-baseline
+    python -m bench --baseline bench_baseline.json  # thoát mã 1 nếu chậm hơn baseline
+    python -m bench --alloc                         # đo bộ nhớ cấp phát mỗi khung (chậm hơn)
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+import main
+from device_state import DeviceStateBus
+from devices import load_registry
+from frontend import AdaptiveFrontEnd
+from gesture import GestureDebouncer
+from landmarks import landmark_buffer
+from main import get_overlay, overlay_layers
+from metrics import Instrumentation
+
+IMAGE_PATTERN = os.path.join("image", "IMG2021060101*.jpg")
+DEFAULT_BASELINE = "bench_baseline.json"
+
+
+def image_source(pattern=IMAGE_PATTERN):
+    frames = [cv2.imread(path) for path in sorted(glob.glob(pattern))]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        raise SystemExit(f"Không tìm thấy ảnh nào khớp {pattern}")
+    i = 0
+    buffer = None
+    while True:
+        # Chép vào một bộ đệm dùng lại, như VideoCapture.read(image=...) trong FramePool
+        frame = frames[i % len(frames)]
+        if buffer is None or buffer.shape != frame.shape:
+            buffer = np.empty_like(frame)
+        np.copyto(buffer, frame)
+        yield buffer
+        i += 1
+
+
+def video_source(path):
+    video = cv2.VideoCapture(path)
+    if not video.isOpened():
+        raise SystemExit(f"Không mở được video {path}")
+    try:
+        while True:
+            ret, frame = video.read()
+            if not ret:
+                # Hết video thì tua lại từ đầu
+                video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = video.read()
+                if not ret:
+                    return
+            yield frame
+    finally:
+        video.release()
+
+
+def synthetic_source(width=640, height=480, seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    i = 0
+    while True:
+        yield np.roll(base, i, axis=1)
+        i += 1
+
+
+def make_source(source):
+    if source == "images":
+        return image_source()
+    if source == "synthetic":
+        return synthetic_source()
+    return video_source(source)
+
+
+def percentiles(samples_ms):
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"mean": float(arr.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+class GcTimer:
+    """Ghi thời gian mỗi lần gc thu gom trong lúc đo (ms)."""
+
+    def __init__(self):
+        self.pauses = []
+        self._start = 0.0
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self._start = time.perf_counter()
+        else:
+            self.pauses.append((time.perf_counter() - self._start) * 1000.0)
+
+
+class BenchApp:
+    """Thay cho SmartHomeApp trong main.process_frame: license luôn hợp lệ, không có cửa sổ."""
+
+    class License:
+        def is_valid(self):
+            return True
+
+    def __init__(self):
+        self.license = self.License()
+        self.registry = load_registry()
+        self.device_bus = DeviceStateBus()
+        self.journal = None
+
+
+def run_benchmark(source="images", frames=200, warmup=10, track_allocations=False):
+    """Chạy đúng tầng suy luận của ứng dụng (main.process_frame: AdaptiveFrontEnd, Hands,
+    đếm ngón, debouncer) và tầng vẽ overlay trên từng khung.
+
+    convert/process/landmarks là các tầng con do process_frame tự đo; infer là cả process_frame.
+    """
+    frame_iter = make_source(source)
+    app = BenchApp()
+    debouncer = GestureDebouncer()
+    frontend = AdaptiveFrontEnd()
+    overlay = get_overlay()
+    timings = {stage: [] for stage in ("capture", "infer", "overlay")}
+    # Byte cấp phát tạm thời tối đa trong mỗi khung (đỉnh tracemalloc trừ mức nền), không tính capture
+    allocated = []
+    lm_buffer = landmark_buffer()
+    gc_timer = GcTimer()
+    clock = time.perf_counter
+    with mp.solutions.hands.Hands(max_num_hands=2,
+                                  min_detection_confidence=0.5,
+                                  min_tracking_confidence=0.5) as hands:
+        start = None
+        for i in range(warmup + frames):
+            if i == warmup:
+                # Thống kê tầng con của process_frame chỉ tính các khung được đo
+                main.stats = Instrumentation(size=max(frames, 1))
+                gc.callbacks.append(gc_timer)
+                if track_allocations:
+                    tracemalloc.start()
+                start = clock()
+            t0 = clock()
+            image = next(frame_iter, None)
+            if image is None:
+                break
+            if track_allocations and i >= warmup:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            t1 = clock()
+            image, hand_list, total = main.process_frame(hands, app, image, debouncer, frontend,
+                                                         lm_buffer=lm_buffer)
+            t2 = clock()
+            overlay.draw(image, *overlay_layers(total))
+            t3 = clock()
+            if i < warmup:
+                continue
+            if track_allocations:
+                allocated.append((tracemalloc.get_traced_memory()[1] - base) / 1024.0)
+            for stage, (a, b) in zip(timings, ((t0, t1), (t1, t2), (t2, t3))):
+                timings[stage].append((b - a) * 1000.0)
+        elapsed = clock() - start if start is not None else 0.0
+    if start is not None:
+        gc.callbacks.remove(gc_timer)
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    measured = len(timings["capture"])
+    if measured == 0:
+        raise SystemExit("Không có khung hình nào được đo")
+    stages = {"capture": timings["capture"]}
+    for stage in ("convert", "process", "landmarks"):
+        samples = main.stats.timings[stage].values()
+        if len(samples):
+            stages[stage] = list(samples)
+    stages["infer"] = timings["infer"]
+    stages["overlay"] = timings["overlay"]
+    return {
+        "source": source,
+        "frames": measured,
+        # Khung được AdaptiveFrontEnd bỏ qua (cảnh tĩnh/chế độ chờ), dùng lại kết quả trước
+        "skipped": main.stats.counters.get("skipped_frames", 0),
+        "fps": measured / elapsed if elapsed > 0 else 0.0,
+        "stages_ms": {stage: percentiles(samples) for stage, samples in stages.items()},
+        "gc": {"collections": len(gc_timer.pauses), "total_ms": float(sum(gc_timer.pauses)),
+               "max_ms": float(max(gc_timer.pauses, default=0.0))},
+        "alloc_kb_per_frame": percentiles(allocated) if allocated else None,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": int(time.time()),
+    }
+
+
+def compare(result, baseline, tolerance, min_delta_ms=0.5):
+    """Trả về danh sách các chỉ số chậm hơn baseline quá tolerance (tỉ lệ).
+
+    Tầng chỉ chậm thêm dưới min_delta_ms bị bỏ qua: với các tầng dưới 1 ms (capture, landmarks)
+    dao động bình thường đã vượt xa tolerance tương đối.
+    """
+    regressions = []
+    if result["fps"] < baseline["fps"] * (1.0 - tolerance):
+        regressions.append(f"fps {result['fps']:.1f} < baseline {baseline['fps']:.1f}")
+    for stage, stats in baseline["stages_ms"].items():
+        current = result["stages_ms"].get(stage)
+        if current is None:
+            continue
+        for key in ("p50", "p95"):
+            if current[key] > stats[key] * (1.0 + tolerance) and current[key] - stats[key] >= min_delta_ms:
+                regressions.append(f"{stage} {key} {current[key]:.2f}ms > baseline {stats[key]:.2f}ms")
+    return regressions
+
+
+def print_report(result):
+    print(f"Nguồn: {result['source']}  khung: {result['frames']} (bỏ qua {result.get('skipped', 0)})  "
+          f"FPS: {result['fps']:.1f}")
+    print(f"{'stage':<10}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for stage, stats in result["stages_ms"].items():
+        print(f"{stage:<10}{stats['mean']:>9.2f}{stats['p50']:>9.2f}{stats['p95']:>9.2f}{stats['p99']:>9.2f}")
+    gc_stats = result.get("gc")
+    if gc_stats:
+        print(f"GC: {gc_stats['collections']} lần, tổng {gc_stats['total_ms']:.2f} ms, lâu nhất {gc_stats['max_ms']:.2f} ms")
+    alloc = result.get("alloc_kb_per_frame")
+    if alloc:
+        print(f"Cấp phát mỗi khung (KB): p50 {alloc['p50']:.1f}  p95 {alloc['p95']:.1f}  p99 {alloc['p99']:.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="images", help="images | synthetic | đường dẫn file video")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help=f"file baseline để so sánh (mặc định {DEFAULT_BASELINE} nếu có)")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="mức chậm cho phép so với baseline (0.15 = 15%%)")
+    parser.add_argument("--min-delta", type=float, default=0.5,
+                        help="mức chậm tuyệt đối tối thiểu (ms) để một tầng bị tính là suy giảm")
+    parser.add_argument("--save-baseline", action="store_true", help="lưu kết quả lần này làm baseline")
+    parser.add_argument("--alloc", action="store_true",
+                        help="đo bộ nhớ cấp phát mỗi khung bằng tracemalloc (làm chậm, không nên so baseline)")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.source, args.frames, args.warmup, args.alloc)
+    print_report(result)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Đã lưu kết quả vào {args.output}")
+
+    baseline_path = args.baseline or DEFAULT_BASELINE
+    if args.save_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Đã lưu baseline vào {baseline_path}")
+        return 0
+    if os.path.exists(baseline_path):
+        with open(baseline_path, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print("!!! HIỆU NĂNG GIẢM SO VỚI BASELINE !!!", file=sys.stderr)
+            for line in regressions:
+                print(f"  - {line}", file=sys.stderr)
+            return 1
+        print(f"Không có suy giảm so với {baseline_path} (tolerance {args.tolerance:.0%})")
+    elif args.baseline:
+        print(f"Không tìm thấy baseline {baseline_path}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,11 @@
-# MOCK controller.py - KHÔNG kết nối Arduino, chỉ in ra màn hình
+# controller.py - các hàm MOCK (KHÔNG kết nối Arduino, chỉ in ra màn hình)
+# và DeviceDispatcher gửi lệnh thiết bị trên luồng nền qua transport tùy chọn
+
+import os
+import queue
+import select
+import threading
+import time
 
 def led(state):
     print(f"[MOCK] LED {'ON' if state else 'OFF'}")
@@ -13,4 +20,329 @@ def stove(state):
     print(f"[MOCK] Bếp {'ON' if state else 'OFF'}")
 
 def ac(state):
-    print(f"[MOCK] Điều hòa {'ON' if state else 'OFF'}")
\ No newline at end of file
+    print(f"[MOCK] Điều hòa {'ON' if state else 'OFF'}")
+
+# --- Giao thức khung lệnh ---
+# Khung lệnh: 0xAA | seq | n | (device_id, state) * n | checksum (XOR các byte từ seq)
+# Khung ack:  0x55 | seq | status (0 = OK)
+FRAME_START = 0xAA
+ACK_START = 0x55
+DEVICE_IDS = {"led": 1, "tv": 2, "fan": 3, "stove": 4, "ac": 5}
+DEVICE_NAMES = {v: k for k, v in DEVICE_IDS.items()}
+MOCK_HANDLERS = {"led": led, "tv": tv, "fan": fan, "stove": stove, "ac": ac}
+# seq, n, mã thiết bị đều là một byte; mã 0 không dùng
+MAX_DEVICE_CODE = 255
+MAX_BATCH = 255
+
+def checksum(data):
+    value = 0
+    for b in data:
+        value ^= b
+    return value
+
+def encode_frame(seq, changes):
+    """changes: [(device_id, state)] -> bytes của một khung lệnh.
+
+    ValueError nếu có quá MAX_BATCH thay đổi hoặc mã thiết bị ngoài 1..MAX_DEVICE_CODE.
+    """
+    if len(changes) > MAX_BATCH:
+        raise ValueError(f"Tối đa {MAX_BATCH} thay đổi mỗi khung, nhận {len(changes)}")
+    body = bytearray([seq & 0xFF, len(changes)])
+    for device_id, state in changes:
+        if not isinstance(device_id, int) or not 1 <= device_id <= MAX_DEVICE_CODE:
+            raise ValueError(f"Mã thiết bị không hợp lệ: {device_id!r}")
+        body += bytes([device_id, 1 if state else 0])
+    return bytes([FRAME_START]) + bytes(body) + bytes([checksum(body)])
+
+def decode_frame(frame):
+    """Trả về (seq, [(device_id, state)]) hoặc None nếu khung hỏng."""
+    if len(frame) < 4 or frame[0] != FRAME_START:
+        return None
+    seq, n = frame[1], frame[2]
+    if len(frame) != 4 + 2 * n or checksum(frame[1:-1]) != frame[-1]:
+        return None
+    return seq, [(frame[3 + 2 * i], bool(frame[4 + 2 * i])) for i in range(n)]
+
+def read_frame(read):
+    """Đọc một khung lệnh hoàn chỉnh bằng hàm read(n) -> bytes (b"" khi hết thời gian)."""
+    head = read(1)
+    while head and head[0] != FRAME_START:
+        head = read(1)
+    if not head:
+        return None
+    meta = read(2)
+    if len(meta) < 2:
+        return None
+    rest = read(2 * meta[1] + 1)
+    return decode_frame(head + meta + rest)
+
+# --- Transport ---
+class MockTransport:
+    """Không có phần cứng: in lệnh ra màn hình như các hàm MOCK và ack ngay lập tức.
+
+    names: mã giao thức -> tên thiết bị, handlers: tên thiết bị -> hàm MOCK
+    (mặc định năm thiết bị có sẵn).
+    """
+
+    def __init__(self, names=None, handlers=None):
+        self.names = names or DEVICE_NAMES
+        self.handlers = handlers or MOCK_HANDLERS
+        self._acks = queue.Queue()
+
+    def write(self, data):
+        decoded = decode_frame(data)
+        if decoded is None:
+            return
+        seq, changes = decoded
+        for device_id, state in changes:
+            name = self.names.get(device_id, device_id)
+            handler = self.handlers.get(name)
+            if handler:
+                try:
+                    handler(state)
+                except Exception as e:
+                    # Hàm MOCK của một thiết bị lỗi không được chặn các thiết bị khác trong khung
+                    print(f"[MOCK] Lỗi {name}: {e!r}")
+            else:
+                print(f"[MOCK] {name} {'ON' if state else 'OFF'}")
+        self._acks.put(bytes([ACK_START, seq, 0]))
+
+    def read_ack(self, timeout):
+        try:
+            return self._acks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        pass
+
+class FdTransport:
+    """Transport trên file descriptor (đầu slave của pty hoặc thiết bị tty đã mở)."""
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def write(self, data):
+        os.write(self.fd, data)
+
+    def _read(self, n, deadline):
+        buf = b""
+        while len(buf) < n:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.fd], [], [], remaining)[0]:
+                break
+            buf += os.read(self.fd, n - len(buf))
+        return buf
+
+    def read_ack(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            head = self._read(1, deadline)
+            if not head:
+                return None
+            if head[0] == ACK_START:
+                rest = self._read(2, deadline)
+                return head + rest if len(rest) == 2 else None
+
+    def close(self):
+        os.close(self.fd)
+
+class SerialTransport:
+    """Arduino thật qua cổng serial (cần pyserial)."""
+
+    def __init__(self, port, baudrate=115200):
+        import serial  # phụ thuộc tùy chọn, chỉ cần khi dùng phần cứng thật
+        self.serial = serial.Serial(port, baudrate, timeout=0)
+
+    def write(self, data):
+        self.serial.write(data)
+
+    def read_ack(self, timeout):
+        self.serial.timeout = timeout
+        head = self.serial.read(1)
+        while head and head[0] != ACK_START:
+            head = self.serial.read(1)
+        if not head:
+            return None
+        rest = self.serial.read(2)
+        return head + rest if len(rest) == 2 else None
+
+    def close(self):
+        self.serial.close()
+
+class FakeArduino:
+    """Arduino giả lập trên pty (chỉ Linux/macOS), dùng để kiểm thử giao thức không cần phần cứng.
+
+    transport() trả về FdTransport nối với đầu slave; luồng nền đọc khung ở đầu master,
+    ghi lại trạng thái thiết bị vào self.states và trả ack. drop_every > 0 bỏ qua ack
+    mỗi drop_every khung để thử cơ chế timeout/retry.
+    """
+
+    def __init__(self, drop_every=0):
+        import pty
+        import tty
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.states = {}
+        self.frames = 0
+        self.drop_every = drop_every
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="fake-arduino", daemon=True)
+        self._thread.start()
+
+    def _read(self, n):
+        buf = b""
+        while len(buf) < n and not self._stop.is_set():
+            try:
+                if select.select([self.master], [], [], 0.1)[0]:
+                    buf += os.read(self.master, n - len(buf))
+            except OSError:
+                # Đầu slave đã đóng
+                self._stop.set()
+        return buf
+
+    def _run(self):
+        while not self._stop.is_set():
+            decoded = read_frame(self._read)
+            if decoded is None:
+                continue
+            seq, changes = decoded
+            self.frames += 1
+            for device_id, state in changes:
+                self.states[DEVICE_NAMES.get(device_id, device_id)] = state
+            if self.drop_every and self.frames % self.drop_every == 0:
+                continue
+            os.write(self.master, bytes([ACK_START, seq, 0]))
+
+    def transport(self):
+        return FdTransport(self.slave)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(1.0)
+        os.close(self.master)
+
+def make_transport(spec=None, device_codes=None, hooks=None):
+    """None/"mock": in ra màn hình, "fake": Arduino giả lập trên pty, còn lại: tên cổng serial."""
+    if not spec or spec == "mock":
+        return MockTransport({v: k for k, v in device_codes.items()} if device_codes else None, hooks)
+    if spec == "fake":
+        return FakeArduino().transport()
+    return SerialTransport(spec)
+
+# --- Dispatcher ---
+class DeviceDispatcher:
+    """Gửi lệnh thiết bị trên luồng nền, không bao giờ chặn luồng nhận diện hay luồng Tk.
+
+    send() chỉ ghi trạng thái mong muốn vào bảng chờ (lệnh trùng thiết bị được gộp,
+    giữ giá trị mới nhất) rồi đánh thức luồng ghi. Luồng ghi gom mọi thay đổi đang chờ
+    thành khung (tối đa MAX_BATCH thay đổi mỗi khung), chờ ack trong ack_timeout và gửi lại
+    tối đa retries lần. Khung vẫn thất bại thì các thay đổi được đưa lại bảng chờ (trừ thiết bị
+    đã có lệnh mới hơn) và thử lại sau retry_delay giây, để thiết bị không lệch mãi với giao diện.
+    device_codes: tên thiết bị -> mã giao thức (mặc định DEVICE_IDS).
+    """
+
+    def __init__(self, transport=None, ack_timeout=0.2, retries=3, device_codes=None, retry_delay=1.0):
+        self.transport = transport or MockTransport()
+        self.device_codes = device_codes or DEVICE_IDS
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.sent_states = {}
+        self.stats = {"frames": 0, "commands": 0, "coalesced": 0, "retries": 0, "failures": 0, "stale_acks": 0}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._seq = 0
+        self._thread = threading.Thread(target=self._run, name="device-dispatcher", daemon=True)
+        self._thread.start()
+
+    def send(self, device, state):
+        with self._lock:
+            if device in self._pending:
+                self.stats["coalesced"] += 1
+            self._pending[device] = bool(state)
+        self._wake.set()
+
+    def _take_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        # Bỏ các lệnh trùng với trạng thái đã gửi thành công
+        return {d: s for d, s in pending.items() if self.sent_states.get(d) != s}
+
+    def _requeue(self, changes):
+        """Đưa lại các thay đổi gửi thất bại vào bảng chờ, trừ thiết bị đã có lệnh mới hơn."""
+        with self._lock:
+            for device, state in changes.items():
+                self._pending.setdefault(device, state)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Còn lệnh chờ gửi lại thì tự thức dậy sau retry_delay
+            self._wake.wait(self.retry_delay if self._pending else None)
+            self._wake.clear()
+            items = []
+            for device, state in self._take_pending().items():
+                code = self.device_codes.get(device)
+                if isinstance(code, int) and 1 <= code <= MAX_DEVICE_CODE:
+                    items.append((device, state))
+                else:
+                    # Lỗi cấu hình, gửi lại cũng không khá hơn nên bỏ hẳn
+                    print(f"[DISPATCH] Bỏ lệnh cho {device}: mã giao thức không hợp lệ {code!r}")
+            for start in range(0, len(items), MAX_BATCH):
+                batch = dict(items[start:start + MAX_BATCH])
+                try:
+                    ok = self._send_frame(batch)
+                except Exception as e:
+                    # Lỗi bất kỳ (hàm MOCK, transport...) không được làm chết luồng ghi
+                    print(f"Lỗi gửi lệnh thiết bị: {e!r}")
+                    self.stats["failures"] += 1
+                    ok = False
+                if not ok:
+                    self._requeue(batch)
+
+    def _send_frame(self, changes):
+        self._seq = (self._seq + 1) & 0xFF
+        codes = self.device_codes
+        frame = encode_frame(self._seq, [(codes[d], s) for d, s in changes.items()])
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+            try:
+                self.transport.write(frame)
+                ack = self._wait_ack(self._seq)
+            except OSError as e:
+                print(f"Lỗi gửi lệnh thiết bị: {e}")
+                ack = None
+            if ack is not None and ack[2] == 0:
+                self.stats["frames"] += 1
+                self.stats["commands"] += len(changes)
+                self.sent_states.update(changes)
+                return True
+        self.stats["failures"] += 1
+        print(f"[DISPATCH] Không nhận được ack cho khung {self._seq}: {changes}")
+        return False
+
+    def _wait_ack(self, seq):
+        """Đọc ack tới khi gặp ack của khung seq hoặc hết ack_timeout.
+
+        Ack đến muộn của khung trước vẫn nằm trong bộ đệm: bỏ qua thay vì tính là một lần thất bại,
+        nếu không mọi khung sau đều đọc nhầm ack cũ và phải gửi lại.
+        """
+        deadline = time.monotonic() + self.ack_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            ack = self.transport.read_ack(remaining)
+            if ack is None or ack[1] == seq:
+                return ack
+            self.stats["stale_acks"] += 1
+
+    def close(self, timeout=1.0):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self.transport.close()
@@ -0,0 +1,52 @@
+import threading
+
+# Giá trị publish thay cho True/False: đảo trạng thái hiện tại khi luồng Tk áp dụng
+TOGGLE = "toggle"
+
+
+class DeviceStateBus:
+    """Kênh trạng thái thiết bị giữa luồng nhận diện và luồng Tk.
+
+    Luồng nhận diện gọi publish() (không chặn, chỉ giữ lock trong vài thao tác dict);
+    luồng Tk gọi drain() định kỳ qua root.after. Nhiều lần publish liên tiếp giữa hai
+    lần drain được gộp lại, mỗi thiết bị chỉ giữ trạng thái mong muốn mới nhất
+    (cùng nguồn của lần publish đó: "gesture", "api", ... để ghi nhật ký).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._sources = {}
+        self._message = None
+
+    def publish(self, states, source="gesture"):
+        with self._lock:
+            for device_id, state in states.items():
+                pending = self._pending.get(device_id)
+                if state == TOGGLE and pending is not None:
+                    if pending == TOGGLE:
+                        # Hai lần đảo liên tiếp triệt tiêu nhau
+                        del self._pending[device_id]
+                        self._sources.pop(device_id, None)
+                        continue
+                    state = not pending
+                self._pending[device_id] = state
+                self._sources[device_id] = source
+
+    def drain(self):
+        """Trả về (trạng thái mong muốn, nguồn) theo id thiết bị."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            sources, self._sources = self._sources, {}
+        return pending, sources
+
+    def post_message(self, text):
+        """Thông báo trạng thái cho nhãn notification (chỉ giữ thông báo mới nhất)."""
+        with self._lock:
+            self._message = text
+
+    def take_message(self):
+        with self._lock:
+            message, self._message = self._message, None
+        return message
+
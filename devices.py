@@ -0,0 +1,129 @@
+import json
+import os
+
+import controller
+
+DEVICES_FILE = "devices.json"
+
+
+class Device:
+    """Mô tả một thiết bị: id, nhãn hiển thị, icon, số ngón điều khiển, mã giao thức, hàm MOCK."""
+
+    def __init__(self, id, label, icon=None, gesture=None, code=None, hook=None):
+        self.id = id
+        self.label = label
+        self.icon = icon
+        self.gesture = gesture
+        self.code = code
+        self.hook = hook
+
+
+# Năm thiết bị có sẵn, giữ nguyên số ngón và mã giao thức như trước
+DEFAULT_DEVICES = [
+    Device("led", "LED", "image/light.png", gesture=1, code=1, hook=controller.led),
+    Device("tv", "TV", "image/tv.png", gesture=2, code=2, hook=controller.tv),
+    Device("fan", "Quạt", "image/fan.png", gesture=3, code=3, hook=controller.fan),
+    Device("stove", "Bếp", "image/stove.png", gesture=4, code=4, hook=controller.stove),
+    Device("ac", "Điều hòa", "image/ac.png", gesture=5, code=5, hook=controller.ac),
+]
+
+
+class DeviceRegistry:
+    """Danh sách thiết bị có thứ tự cố định; chỉ số trong danh sách dùng làm chỉ số mảng trạng thái."""
+
+    def __init__(self, devices):
+        self.devices = list(devices)
+        self.index = {d.id: i for i, d in enumerate(self.devices)}
+        self.by_gesture = {d.gesture: d.id for d in self.devices if d.gesture is not None}
+        used = {d.code for d in self.devices if d.code is not None}
+        code = 1
+        for d in self.devices:
+            if d.code is None:
+                # Tự cấp mã giao thức cho thiết bị không khai báo
+                while code in used:
+                    code += 1
+                d.code = code
+                used.add(code)
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def __getitem__(self, i):
+        return self.devices[i]
+
+    def get(self, device_id):
+        i = self.index.get(device_id)
+        return self.devices[i] if i is not None else None
+
+    def device_for_gesture(self, total):
+        return self.by_gesture.get(total)
+
+    def gesture_devices(self):
+        return [d.id for d in self.devices if d.gesture is not None]
+
+    def states_for_fingers(self, total):
+        """Trạng thái mong muốn cho tổng số ngón: chỉ bật thiết bị gán với số ngón đó.
+
+        0 ngón tắt các thiết bị gán cử chỉ; số ngón chưa gán thiết bị trả về None (giữ nguyên).
+        """
+        target = self.device_for_gesture(total)
+        if total != 0 and target is None:
+            return None
+        return {name: name == target for name in self.gesture_devices()}
+
+    def device_codes(self):
+        return {d.id: d.code for d in self.devices}
+
+    def hooks(self):
+        return {d.id: d.hook for d in self.devices if d.hook is not None}
+
+
+def load_registry(path=DEVICES_FILE):
+    """Đọc danh sách thiết bị từ file JSON nếu có, ngược lại dùng DEFAULT_DEVICES.
+
+    Mỗi phần tử: {"id": "...", "label": "...", "icon": "...", "gesture": 6, "code": 6, "hook": "led"}
+    "hook" (mặc định bằng id) chọn hàm MOCK trong controller.MOCK_HANDLERS; không có thì bỏ qua.
+    """
+    if not os.path.exists(path):
+        return DeviceRegistry(DEFAULT_DEVICES)
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    devices = []
+    for entry in entries:
+        # Chỉ tra trong MOCK_HANDLERS: id trùng tên hàm khác của controller không được thành hook
+        hook = controller.MOCK_HANDLERS.get(entry.get("hook", entry["id"]))
+        devices.append(Device(entry["id"], entry.get("label", entry["id"]), entry.get("icon"),
+                              entry.get("gesture"), entry.get("code"), hook))
+    return DeviceRegistry(devices)
+
+
+class DeviceStateStore:
+    """Trạng thái thiết bị lưu trong bytearray theo chỉ số registry, kèm cờ dirty cho từng thiết bị."""
+
+    def __init__(self, size):
+        self.states = bytearray(size)
+        self.dirty = bytearray(size)
+        self.dirty_indices = []
+
+    def get(self, i):
+        return bool(self.states[i])
+
+    def set(self, i, state):
+        value = 1 if state else 0
+        if self.states[i] == value:
+            return False
+        self.states[i] = value
+        if not self.dirty[i]:
+            self.dirty[i] = 1
+            self.dirty_indices.append(i)
+        return True
+
+    def take_dirty(self):
+        """Trả về các chỉ số đã đổi kể từ lần gọi trước và xóa cờ dirty."""
+        changed, self.dirty_indices = self.dirty_indices, []
+        for i in changed:
+            self.dirty[i] = 0
+        return changed
@@ -0,0 +1,140 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class AdaptiveFrontEnd:
+    """Chuẩn bị ảnh đưa vào hands.process, giảm khối lượng suy luận khi có thể.
+
+    - ROI: khi đang bám được bàn tay, chỉ cắt vùng quanh landmark lần trước (nới thêm roi_margin)
+    - Thu nhỏ: ảnh suy luận có chiều rộng tối đa inference_width, landmark được đổi về tọa độ khung gốc
+    - Khung tĩnh: so sánh ảnh xám thu nhỏ, cảnh không đổi thì dùng lại kết quả cũ; chỉ áp dụng khi
+      không bám tay (đổi số ngón chỉ làm thay đổi một vùng nhỏ, trung bình toàn khung không thấy được)
+    - Chế độ chờ: không thấy tay và không có chuyển động trong idle_after giây thì chỉ suy luận
+      idle_fps lần/giây, có chuyển động là quay lại tốc độ đầy đủ ngay
+
+    Mọi ảnh trung gian được ghi vào bộ đệm dùng lại (dst=...); chỉ cấp phát lại khi kích thước
+    ROI đổi. Ảnh RGB trả về vì vậy chỉ hợp lệ tới lần prepare() sau.
+    """
+
+    def __init__(self, inference_width=320, roi_margin=0.5, min_roi=0.4, motion_threshold=2.0,
+                 motion_size=(64, 48), static_refresh=0.5, idle_after=10.0, idle_fps=2.0,
+                 track_hold=1.0, clock=time.monotonic):
+        self.inference_width = inference_width
+        self.roi_margin = roi_margin
+        self.min_roi = min_roi
+        self.motion_threshold = motion_threshold
+        self.motion_size = motion_size
+        self.static_refresh = static_refresh
+        self.idle_after = idle_after
+        self.idle_fps = idle_fps
+        # Vừa mất tay dưới track_hold giây vẫn coi là đang bám, suy luận mọi khung
+        self.track_hold = track_hold
+        self.clock = clock
+        self.roi = None  # (x0, y0, x1, y1) pixel
+        self.mapping = None  # (x0, y0, crop_w, crop_h, frame_w, frame_h)
+        self.idle = False
+        self.last_hand_time = clock()
+        self.last_motion_time = self.last_hand_time
+        self.last_inference_time = 0.0
+        self.last_hands = []
+        self.last_total = None
+        self._prev_small = None
+        self._small = None
+        self._gray = None
+        self._diff = None
+        self._resized = None
+        self._rgb = None
+
+    def _motion(self, frame):
+        small = cv2.resize(frame, self.motion_size, dst=self._small, interpolation=cv2.INTER_AREA)
+        self._small = small
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        # Hai bộ đệm xám luân phiên: khung này thành "khung trước" của lần sau
+        self._gray = self._prev_small
+        self._prev_small = gray
+        if self._gray is None:
+            return True
+        self._diff = cv2.absdiff(gray, self._gray, dst=self._diff)
+        return cv2.mean(self._diff)[0] > self.motion_threshold
+
+    def prepare(self, frame):
+        """Trả về ảnh RGB để suy luận, hoặc None nếu nên bỏ qua khung này."""
+        now = self.clock()
+        moving = self._motion(frame)
+        if moving:
+            self.last_motion_time = now
+        # Chỉ chờ khi cả tay lẫn chuyển động đều đã vắng quá idle_after giây
+        self.idle = now - max(self.last_hand_time, self.last_motion_time) > self.idle_after
+        since = now - self.last_inference_time
+        tracking = self.roi is not None or now - self.last_hand_time < self.track_hold
+        if not moving and not tracking:
+            if self.idle and since < 1.0 / self.idle_fps:
+                return None
+            if not self.idle and since < self.static_refresh:
+                return None
+        self.last_inference_time = now
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = self.roi if self.roi is not None else (0, 0, w, h)
+        crop = frame[y0:y1, x0:x1]
+        cw, ch = x1 - x0, y1 - y0
+        self.mapping = (x0, y0, cw, ch, w, h)
+        if cw > self.inference_width:
+            size = (self.inference_width, max(1, int(ch * self.inference_width / cw)))
+            self._resized = cv2.resize(crop, size, dst=self._resized, interpolation=cv2.INTER_AREA)
+            crop = self._resized
+        if self._rgb is not None:
+            # Lần trước đã đánh dấu chỉ đọc khi đưa vào hands.process
+            self._rgb.flags.writeable = True
+        # Bản RGB duy nhất của khung; khung BGR gốc được giữ nguyên để vẽ
+        self._rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        return self._rgb
+
+    def map_back(self, multi_hand_landmarks):
+        """Đổi landmark (chuẩn hóa theo ảnh suy luận) về tọa độ chuẩn hóa của khung gốc, sửa tại chỗ."""
+        if not multi_hand_landmarks or self.mapping is None:
+            return
+        x0, y0, cw, ch, w, h = self.mapping
+        if (x0, y0, cw, ch) == (0, 0, w, h):
+            return
+        sx, sy, ox, oy = cw / w, ch / h, x0 / w, y0 / h
+        for hand in multi_hand_landmarks:
+            for lm in hand.landmark:
+                lm.x = ox + lm.x * sx
+                lm.y = oy + lm.y * sy
+                lm.z = lm.z * sx
+
+    def update(self, lm, frame_shape, hand_list=(), total=None):
+        """Cập nhật ROI từ landmark (n, 21, 3) chuẩn hóa theo khung gốc; lm rỗng/None là mất dấu."""
+        self.last_hands = hand_list
+        self.last_total = total
+        if lm is None or len(lm) == 0:
+            self.roi = None
+            return
+        now = self.clock()
+        self.last_hand_time = now
+        self.idle = False
+        h, w = frame_shape[:2]
+        xy = lm[..., :2].reshape(-1, 2)
+        bx0, by0 = xy.min(axis=0)
+        bx1, by1 = xy.max(axis=0)
+        if self.roi is not None:
+            # Tay vẫn nằm gọn trong vùng lõi của ROI hiện tại thì giữ nguyên ROI
+            rx0, ry0, rx1, ry1 = self.roi
+            mx, my = (rx1 - rx0) * 0.15, (ry1 - ry0) * 0.15
+            if bx0 * w > rx0 + mx and bx1 * w < rx1 - mx and by0 * h > ry0 + my and by1 * h < ry1 - my:
+                return
+        bw, bh = bx1 - bx0, by1 - by0
+        half_w = max(bw * (0.5 + self.roi_margin), self.min_roi / 2)
+        half_h = max(bh * (0.5 + self.roi_margin), self.min_roi / 2)
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        x0 = int(np.clip((cx - half_w) * w, 0, w - 1))
+        x1 = int(np.clip((cx + half_w) * w, x0 + 1, w))
+        y0 = int(np.clip((cy - half_h) * h, 0, h - 1))
+        y1 = int(np.clip((cy + half_h) * h, y0 + 1, h))
+        self.roi = (x0, y0, x1, y1)
+
+    def frame_interval(self):
+        """Khoảng nghỉ tối thiểu giữa hai lần suy luận (dùng để hạ tải CPU ở chế độ chờ)."""
+        return 1.0 / self.idle_fps if self.idle else 0.0
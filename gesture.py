@@ -0,0 +1,73 @@
+import time
+from collections import Counter, deque
+
+
+class GestureDebouncer:
+    """Ổn định số ngón tay theo thời gian trước khi điều khiển thiết bị.
+
+    - window: số khung gần nhất được giữ lại
+    - min_frames: số lần giá trị phải xuất hiện trong cửa sổ (và liên tiếp ở cuối cửa sổ)
+    - min_dwell: thời gian tối thiểu (giây) giá trị phải giữ ổn định
+    - cooldown: thời gian chờ (giây) sau mỗi lần đổi trạng thái
+
+    update() chỉ trả về giá trị mới khi có chuyển trạng thái, ngược lại trả về None.
+    """
+
+    def __init__(self, window=7, min_frames=4, min_dwell=0.15, cooldown=0.6, clock=time.monotonic):
+        self.window = window
+        self.min_frames = min_frames
+        self.min_dwell = min_dwell
+        self.cooldown = cooldown
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self.history = deque(maxlen=self.window)
+        self.committed = None
+        self.last_commit_time = None
+        self.candidate = None
+        self.candidate_since = None
+        self.streak = 0
+        self.commits = 0
+        self.frames = 0
+
+    def update(self, count, now=None):
+        if now is None:
+            now = self.clock()
+        self.frames += 1
+        self.history.append(count)
+        if count == self.candidate:
+            self.streak += 1
+        else:
+            self.candidate = count
+            self.candidate_since = now
+            self.streak = 1
+        if count == self.committed:
+            return None
+        if self.streak < self.min_frames or now - self.candidate_since < self.min_dwell:
+            return None
+        # Giá trị mới phải chiếm đa số trong cửa sổ, tránh nhiễu xen kẽ
+        value, occurrences = Counter(self.history).most_common(1)[0]
+        if value != count or occurrences < self.min_frames:
+            return None
+        if self.last_commit_time is not None and now - self.last_commit_time < self.cooldown:
+            return None
+        self.committed = count
+        self.last_commit_time = now
+        self.commits += 1
+        return count
+
+    def commands_per_minute(self, elapsed):
+        """Số lần chốt mỗi phút trong elapsed giây (python -m landmark_trace in ra cho mỗi trace)."""
+        return self.commits * 60.0 / elapsed if elapsed > 0 else 0.0
+
+
+def stabilize(counts, debouncer=None, fps=30.0):
+    """Chạy một chuỗi số ngón tổng hợp qua debouncer, trả về danh sách (index, giá trị được chốt)."""
+    debouncer = debouncer or GestureDebouncer()
+    events = []
+    for i, count in enumerate(counts):
+        value = debouncer.update(count, now=i / fps)
+        if value is not None:
+            events.append((i, value))
+    return events
@@ -0,0 +1,209 @@
+"""Nhận dạng cử chỉ tĩnh (thumbs-up, OK, pinch, ...) bằng so khớp mẫu landmark.
+
+Mẫu được lấy từ file landmark trace (xem landmark_trace.py) và lưu trong file .npz:
+    python -m gesture_templates add gestures.npz thumbs_up thumbs_up.lmtrace
+    python -m gesture_templates bind gestures.npz thumbs_up led on    # on | off | toggle
+    python -m gesture_templates list gestures.npz
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+from device_state import TOGGLE
+from gesture import GestureDebouncer
+from landmarks import NUM_LANDMARKS, handedness_signs
+
+GESTURE_LIBRARY_FILE = "gestures.npz"
+FEATURE_SIZE = NUM_LANDMARKS * 3
+# Khớp MCP ngón giữa, dùng làm trục "lên" của lòng bàn tay
+MIDDLE_MCP = 9
+
+
+def normalize_landmarks(lm, signs=None, aspect=1.0):
+    """(n, 21, 3) landmark -> (n, 63) vector đặc trưng.
+
+    Dời gốc về cổ tay, nhân x với aspect (= rộng / cao của khung) để x, y cùng đơn vị,
+    xoay để cổ tay -> MCP ngón giữa hướng lên, chia cho độ dài đoạn đó,
+    lật trục x khi signs = -1 (tay trái thật, xem landmarks.handedness_signs) để
+    một mẫu dùng được cho cả hai tay.
+    """
+    pts = lm - lm[:, :1, :]
+    # Landmark mediapipe chuẩn hóa x theo chiều rộng, y theo chiều cao: phép xoay chỉ đúng
+    # khi hai trục cùng tỉ lệ
+    pts[:, :, 0] *= aspect
+    v = pts[:, MIDDLE_MCP, :2]
+    scale = np.maximum(np.hypot(v[:, 0], v[:, 1]), 1e-6)
+    theta = -np.pi / 2 - np.arctan2(v[:, 1], v[:, 0])
+    c, s = np.cos(theta)[:, None], np.sin(theta)[:, None]
+    x, y = pts[:, :, 0], pts[:, :, 1]
+    out = np.empty_like(pts, dtype=np.float32)
+    out[:, :, 0] = x * c - y * s
+    out[:, :, 1] = x * s + y * c
+    out[:, :, 2] = pts[:, :, 2]
+    out /= scale[:, None, None]
+    if signs is not None:
+        out[:, :, 0] *= signs[:, None]
+    return out.reshape(len(lm), FEATURE_SIZE)
+
+
+class GestureLibrary:
+    """Thư viện mẫu cử chỉ + ánh xạ cử chỉ -> hành động thiết bị.
+
+    classify() tính khoảng cách tới mọi mẫu cùng lúc bằng một phép nhân ma trận,
+    lấy khoảng cách nhỏ nhất của từng cử chỉ, rồi đổi thành độ tin cậy
+    confidence = 1 - distance / max_distance.
+    """
+
+    def __init__(self, max_distance=1.5, min_confidence=0.5):
+        self.max_distance = max_distance
+        self.min_confidence = min_confidence
+        self.names = []
+        self.bindings = {}  # tên cử chỉ -> (device_id, "on" | "off" | "toggle")
+        self.templates = np.zeros((0, FEATURE_SIZE), dtype=np.float32)
+        self.labels = np.zeros(0, dtype=np.int64)
+        self._rebuild()
+
+    def __len__(self):
+        return len(self.templates)
+
+    def _rebuild(self):
+        # Sắp xếp mẫu theo nhãn để lấy min theo từng cử chỉ bằng np.minimum.reduceat
+        order = np.argsort(self.labels, kind="stable")
+        self.templates = np.ascontiguousarray(self.templates[order])
+        self.labels = self.labels[order]
+        self._norms = (self.templates ** 2).sum(axis=1)
+        self._class_ids, self._class_starts = np.unique(self.labels, return_index=True)
+
+    def add(self, name, features):
+        if name not in self.names:
+            self.names.append(name)
+        label = self.names.index(name)
+        features = np.asarray(features, dtype=np.float32).reshape(-1, FEATURE_SIZE)
+        self.templates = np.concatenate([self.templates, features])
+        self.labels = np.concatenate([self.labels, np.full(len(features), label, dtype=np.int64)])
+        self._rebuild()
+
+    def bind(self, name, device_id, action="toggle"):
+        if action not in ("on", "off", "toggle"):
+            raise ValueError(f"Hành động không hợp lệ: {action}")
+        self.bindings[name] = (device_id, action)
+
+    def classify(self, features):
+        """features (n, 63) -> danh sách (tên cử chỉ hoặc None, độ tin cậy) cho từng bàn tay."""
+        if len(features) == 0 or len(self.templates) == 0:
+            return [(None, 0.0)] * len(features)
+        d2 = (features ** 2).sum(axis=1)[:, None] + self._norms[None, :] - 2.0 * features @ self.templates.T
+        class_d2 = np.minimum.reduceat(np.maximum(d2, 0.0), self._class_starts, axis=1)
+        best = class_d2.argmin(axis=1)
+        distance = np.sqrt(class_d2[np.arange(len(features)), best])
+        confidence = np.clip(1.0 - distance / self.max_distance, 0.0, 1.0)
+        results = []
+        for b, conf in zip(best.tolist(), confidence.tolist()):
+            name = self.names[self._class_ids[b]] if conf >= self.min_confidence else None
+            results.append((name, conf))
+        return results
+
+    def binding_states(self, name):
+        """Trạng thái cần publish khi cử chỉ name được chốt (bool hoặc TOGGLE), None nếu chưa gán."""
+        binding = self.bindings.get(name)
+        if binding is None:
+            return None
+        device_id, action = binding
+        if action == "toggle":
+            # Luồng Tk đảo trạng thái lúc áp dụng, tính cả các lệnh còn chờ trong bus
+            return {device_id: TOGGLE}
+        return {device_id: action == "on"}
+
+    def save(self, path=GESTURE_LIBRARY_FILE):
+        np.savez(path, templates=self.templates, labels=self.labels,
+                 names=np.array(self.names, dtype=str),
+                 bindings=np.array(json.dumps(self.bindings, ensure_ascii=False)),
+                 params=np.array([self.max_distance, self.min_confidence]))
+
+    @classmethod
+    def load(cls, path=GESTURE_LIBRARY_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            max_distance, min_confidence = data["params"].tolist()
+            library = cls(max_distance, min_confidence)
+            library.names = data["names"].tolist()
+            library.bindings = {k: tuple(v) for k, v in json.loads(str(data["bindings"])).items()}
+            library.templates = data["templates"].astype(np.float32)
+            library.labels = data["labels"].astype(np.int64)
+        library._rebuild()
+        return library
+
+
+class GestureEngine:
+    """Phân loại cử chỉ mỗi khung, ổn định theo thời gian rồi trả về cử chỉ vừa được chốt."""
+
+    def __init__(self, library, debouncer=None):
+        self.library = library
+        self.debouncer = debouncer or GestureDebouncer()
+
+    def update(self, lm, multi_handedness=None, aspect=1.0):
+        """Trả về (tên cử chỉ nhận ra trong khung này, tên cử chỉ vừa được chốt hoặc None).
+
+        aspect: rộng / cao của khung mà lm được chuẩn hóa theo.
+        """
+        if lm is None or len(lm) == 0:
+            # Không thấy tay: chốt trạng thái "không cử chỉ" để lần sau cùng cử chỉ vẫn được nhận
+            self.debouncer.update(None)
+            return None, None
+        features = normalize_landmarks(lm, handedness_signs(multi_handedness, len(lm)), aspect)
+        best = None
+        best_conf = 0.0
+        for name, conf in self.library.classify(features):
+            if name is not None and conf > best_conf:
+                best, best_conf = name, conf
+        committed = self.debouncer.update(best)
+        return best, committed
+
+
+def load_engine(path=GESTURE_LIBRARY_FILE):
+    """GestureEngine nếu file thư viện tồn tại và có mẫu, ngược lại None."""
+    if not os.path.exists(path):
+        return None
+    library = GestureLibrary.load(path)
+    return GestureEngine(library) if len(library) else None
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print(__doc__)
+        return 1
+    command, path = argv[0], argv[1]
+    library = GestureLibrary.load(path) if os.path.exists(path) else GestureLibrary()
+    if command == "add" and len(argv) >= 4:
+        from landmark_trace import load_trace
+        name = argv[2]
+        added = 0
+        for trace_path in argv[3:]:
+            header, records = load_trace(trace_path)
+            # Chỉ lấy tay đầu tiên của các khung có tay
+            mask = np.asarray(records["n"]) > 0
+            lm = np.asarray(records["lm"][mask, 0])
+            signs = np.asarray(records["sign"][mask, 0])
+            library.add(name, normalize_landmarks(lm, signs, header["aspect"]))
+            added += int(mask.sum())
+        library.save(path)
+        print(f"Đã thêm {added} mẫu cho '{name}' ({len(library)} mẫu tất cả)")
+    elif command == "bind" and len(argv) == 5:
+        library.bind(argv[2], argv[3], argv[4])
+        library.save(path)
+        print(f"'{argv[2]}' -> {argv[3]} {argv[4]}")
+    elif command == "list":
+        for label, name in enumerate(library.names):
+            count = int((library.labels == label).sum())
+            binding = library.bindings.get(name)
+            print(f"{name:<16}{count:>6} mẫu   {' '.join(binding) if binding else '(chưa gán)'}")
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""Nhật ký trạng thái thiết bị và cử chỉ (append-only, xoay vòng theo kích thước).
+
+Mỗi segment gồm:
+    journal-000001.jsonl   một bản ghi JSON mỗi dòng
+    journal-000001.idx     chỉ mục thời gian: các cặp (t float64, offset uint64),
+                           một mục cho bản ghi đầu segment và sau mỗi index_every bản ghi
+
+Truy vấn theo khoảng thời gian chỉ mở các segment giao với khoảng đó và seek thẳng tới
+mục chỉ mục gần nhất, không đọc lại toàn bộ file.
+
+Ví dụ:
+    python -m journal --since 24h --device stove --state on
+"""
+import argparse
+import bisect
+import json
+import os
+import re
+import struct
+import sys
+import threading
+import time
+
+JOURNAL_DIR = "journal"
+SEGMENT_PATTERN = re.compile(r"^journal-(\d{6})\.jsonl$")
+INDEX_ENTRY = struct.Struct("<dQ")
+
+
+def segment_paths(directory, number):
+    base = os.path.join(directory, f"journal-{number:06d}")
+    return base + ".jsonl", base + ".idx"
+
+
+def list_segments(directory):
+    """Số thứ tự các segment hiện có, tăng dần."""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return sorted(int(m.group(1)) for m in map(SEGMENT_PATTERN.match, names) if m)
+
+
+def read_index(path):
+    """(danh sách t, danh sách offset) của một file chỉ mục; mục ghi dở ở cuối bị bỏ qua."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return [], []
+    data = data[:len(data) - len(data) % INDEX_ENTRY.size]
+    times, offsets = [], []
+    for t, offset in INDEX_ENTRY.iter_unpack(data):
+        times.append(t)
+        offsets.append(offset)
+    return times, offsets
+
+
+class DeviceJournal(threading.Thread):
+    """Luồng nền ghi nhật ký theo lô.
+
+    device()/gesture() chỉ thêm bản ghi vào bộ đệm trong bộ nhớ (giữ lock vài thao tác),
+    gọi được từ luồng Tk và luồng nhận diện mà không chạm tới đĩa.
+    Luồng nền ghi bộ đệm ra file sau mỗi flush_interval giây, sang segment mới khi
+    segment hiện tại vượt max_segment_bytes và xóa segment cũ nhất khi quá max_segments.
+    Ghi lỗi (đầy đĩa, không có quyền...) thì lô được giữ lại để thử lần sau; bộ đệm giữ
+    tối đa max_buffer bản ghi, quá thì bỏ bản ghi cũ nhất (đếm trong dropped).
+    """
+
+    def __init__(self, directory=JOURNAL_DIR, max_segment_bytes=4 * 1024 * 1024, max_segments=20,
+                 flush_interval=1.0, index_every=64, max_buffer=10000, clock=time.time):
+        super().__init__(name="device-journal", daemon=True)
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+        self.index_every = index_every
+        self.max_buffer = max_buffer
+        self.clock = clock
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._buffer = []
+        # Chỉ luồng ghi (hoặc flush() khi luồng đã dừng) đụng tới các file dưới đây
+        self._write_lock = threading.Lock()
+        self._number = None
+        self._file = None
+        self._index = None
+        self._since_index = 0
+        self.written = 0
+        self.dropped = 0
+        self._last_error = None
+
+    # --- Gọi từ mọi luồng ---
+    def append(self, record):
+        with self._lock:
+            # Gán thời điểm trong lock để thứ tự trong file luôn theo thời gian
+            record["t"] = round(self.clock(), 3)
+            self._buffer.append(record)
+            self._trim()
+
+    def _trim(self):
+        # Gọi khi đang giữ _lock
+        excess = len(self._buffer) - self.max_buffer
+        if excess > 0:
+            del self._buffer[:excess]
+            self.dropped += excess
+
+    def device(self, device_id, old, new, source):
+        """Một lần đổi trạng thái thiết bị; source: "gesture", "manual", "api", ..."""
+        self.append({"kind": "device", "device": device_id, "old": bool(old), "new": bool(new),
+                     "source": source})
+
+    def gesture(self, name, source="gesture"):
+        """Một cử chỉ vừa được chốt (số ngón hoặc tên mẫu cử chỉ)."""
+        self.append({"kind": "gesture", "gesture": name, "source": source})
+
+    # --- Luồng ghi ---
+    def run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self._safe_flush()
+        self._safe_flush()
+        self.close_segment()
+
+    def _safe_flush(self):
+        # Lỗi ghi không được làm chết luồng: lần flush sau thử lại với lô cũ
+        try:
+            self.flush()
+            self._last_error = None
+        except Exception as e:
+            # Lỗi kéo dài (đĩa đầy) chỉ in một lần thay vì mỗi flush_interval
+            if repr(e) != self._last_error:
+                self._last_error = repr(e)
+                print(f"[JOURNAL] Lỗi ghi nhật ký: {e!r}")
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        with self._write_lock:
+            try:
+                if self._file is None:
+                    self.open_segment()
+                self._write_batch(batch)
+            except Exception:
+                # Chưa ghi được: trả lô về đầu bộ đệm (trước các bản ghi mới hơn), mở lại file lần sau
+                try:
+                    self._close_files()
+                except OSError:
+                    pass
+                with self._lock:
+                    self._buffer[:0] = batch
+                    self._trim()
+                raise
+            self.written += len(batch)
+            if self._file.tell() >= self.max_segment_bytes:
+                self._close_files()
+                self._number += 1
+                # Mở segment mới trước khi dọn để tổng số segment trên đĩa không vượt max_segments
+                self.open_segment()
+                self.prune()
+
+    def _write_batch(self, batch):
+        lines = []
+        offset = self._file.tell()
+        index = bytearray()
+        for record in batch:
+            line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+            if self._since_index >= self.index_every:
+                index += INDEX_ENTRY.pack(record["t"], offset)
+                self._since_index = 0
+            self._since_index += 1
+            lines.append(line)
+            offset += len(line)
+        # Dữ liệu ghi trước chỉ mục: mục chỉ mục không bao giờ trỏ quá cuối file
+        self._file.write(b"".join(lines))
+        self._file.flush()
+        if index:
+            self._index.write(index)
+            self._index.flush()
+
+    def open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self._number is None:
+            existing = list_segments(self.directory)
+            self._number = existing[-1] if existing else 1
+        data_path, index_path = segment_paths(self.directory, self._number)
+        self._file = open(data_path, "ab")
+        self._index = open(index_path, "ab")
+        # Segment mới (hoặc mở lại sau khi khởi động): bản ghi đầu tiên luôn có mục chỉ mục
+        self._since_index = self.index_every
+
+    def close_segment(self):
+        with self._write_lock:
+            self._close_files()
+
+    def _close_files(self):
+        files = (self._file, self._index)
+        self._file = self._index = None
+        for f in files:
+            if f is not None:
+                f.close()
+
+    def prune(self):
+        for number in list_segments(self.directory)[:-self.max_segments]:
+            for path in segment_paths(self.directory, number):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    # --- Truy vấn ---
+    def query(self, since=None, until=None, **filters):
+        return query_journal(self.directory, since, until, **filters)
+
+
+def query_journal(directory=JOURNAL_DIR, since=None, until=None, kind=None, device=None, state=None,
+                  source=None):
+    """Duyệt các bản ghi có since <= t <= until khớp bộ lọc, theo thứ tự thời gian.
+
+    state: True/False lọc theo trạng thái mới của thiết bị.
+    """
+    numbers = list_segments(directory)
+    indexes = [read_index(segment_paths(directory, n)[1]) for n in numbers]
+    starts = [times[0] if times else None for times, _ in indexes]
+    for i, number in enumerate(numbers):
+        times, offsets = indexes[i]
+        if starts[i] is None:
+            continue
+        if until is not None and starts[i] > until:
+            break
+        # Segment i kết thúc trước khi segment kế tiếp có dữ liệu bắt đầu
+        next_start = next((s for s in starts[i + 1:] if s is not None), None)
+        if since is not None and next_start is not None and next_start < since:
+            continue
+        offset = 0
+        if since is not None:
+            # Mục chỉ mục cuối cùng có t < since: mọi bản ghi trước nó đều sớm hơn since
+            k = bisect.bisect_left(times, since) - 1
+            offset = offsets[k] if k >= 0 else 0
+        try:
+            f = open(segment_paths(directory, number)[0], "rb")
+        except OSError:
+            continue
+        with f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Dòng ghi dở (luồng ghi đang ghi hoặc chương trình bị tắt ngang)
+                    continue
+                t = record.get("t", 0.0)
+                if since is not None and t < since:
+                    continue
+                if until is not None and t > until:
+                    return
+                if kind is not None and record.get("kind") != kind:
+                    continue
+                if device is not None and record.get("device") != device:
+                    continue
+                if state is not None and record.get("new") != state:
+                    continue
+                if source is not None and record.get("source") != source:
+                    continue
+                yield record
+
+
+def parse_duration(text):
+    """"90", "30m", "24h", "7d" -> số giây."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text[-1:] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m journal", description=__doc__.splitlines()[0])
+    parser.add_argument("--dir", default=JOURNAL_DIR)
+    parser.add_argument("--since", help="khoảng thời gian tính lùi từ hiện tại, ví dụ 30m, 24h, 7d")
+    parser.add_argument("--kind", choices=["device", "gesture"])
+    parser.add_argument("--device")
+    parser.add_argument("--state", choices=["on", "off"])
+    parser.add_argument("--source")
+    args = parser.parse_args(argv)
+    since = time.time() - parse_duration(args.since) if args.since else None
+    state = None if args.state is None else args.state == "on"
+    count = 0
+    for record in query_journal(args.dir, since, None, args.kind, args.device, state, args.source):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["t"]))
+        if record["kind"] == "device":
+            detail = f"{record['device']:<10}{'ON' if record['old'] else 'OFF'} -> {'ON' if record['new'] else 'OFF'}"
+        else:
+            detail = f"cử chỉ {record['gesture']}"
+        print(f"{stamp}  {detail:<32}{record.get('source', '')}")
+        count += 1
+    print(f"{count} bản ghi")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
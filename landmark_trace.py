@@ -0,0 +1,154 @@
+"""Ghi và phát lại landmark bàn tay để kiểm thử logic cử chỉ không cần camera/mediapipe.
+
+File trace gồm header 64 byte và các bản ghi float32 có kích thước cố định
+(đọc được bằng numpy.memmap):
+    t          thời điểm (giây, tính từ start_time trong header)
+    n          số bàn tay trong khung
+    sign       (max_hands,) +1/-1 theo handedness (xem landmarks.handedness_signs)
+    lm         (max_hands, 21, 3) landmark chuẩn hóa, tay không có thì là 0
+
+Ví dụ:
+    python -m landmark_trace session.lmtrace
+"""
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from devices import load_registry
+from gesture import GestureDebouncer
+from landmarks import NUM_LANDMARKS, fingers_extended, handedness_signs
+
+MAGIC = b"LMTRACE1"
+HEADER_SIZE = 64
+VERSION = 3
+# magic, version, max_hands, record_size (byte), start_time (epoch), aspect (rộng / cao của khung)
+# Bản 1 không có aspect (phần đệm bằng 0), đọc ra coi như 1.0
+# Bản 1-2 ghi sign theo bảng dấu handedness bị đảo, được lật lại khi đọc
+HEADER_FORMAT = "<8sIIIdd"
+
+
+def record_dtype(max_hands):
+    return np.dtype([
+        ("t", "<f4"),
+        ("n", "<f4"),
+        ("sign", "<f4", (max_hands,)),
+        ("lm", "<f4", (max_hands, NUM_LANDMARKS, 3)),
+    ])
+
+
+class TraceRecorder:
+    """Ghi landmark từng khung ra file trace (dùng trong luồng suy luận)."""
+
+    def __init__(self, path, max_hands=2, start_time=None, aspect=1.0):
+        self.path = path
+        self.max_hands = max_hands
+        self.aspect = aspect
+        self.start_time = time.time() if start_time is None else start_time
+        self.dtype = record_dtype(max_hands)
+        self._record = np.zeros(1, dtype=self.dtype)
+        self.frames = 0
+        self.file = open(path, "wb")
+        header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, max_hands, self.dtype.itemsize, self.start_time,
+                             aspect)
+        self.file.write(header.ljust(HEADER_SIZE, b"\0"))
+
+    def record(self, lm=None, multi_handedness=None, timestamp=None):
+        """lm: mảng (n, 21, 3) từ landmarks.count_fingers, None/rỗng nếu không thấy tay."""
+        rec = self._record
+        rec["t"] = (time.time() if timestamp is None else timestamp) - self.start_time
+        n = 0 if lm is None else min(len(lm), self.max_hands)
+        rec["n"] = n
+        rec["sign"] = 1.0
+        rec["lm"] = 0.0
+        if n:
+            rec["lm"][0, :n] = lm[:n]
+            rec["sign"][0, :n] = handedness_signs(multi_handedness, n)
+        self.file.write(self._record.tobytes())
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+
+
+def load_trace(path):
+    """Mở file trace bằng numpy.memmap, trả về (header dict, mảng bản ghi)."""
+    with open(path, "rb") as f:
+        magic, version, max_hands, record_size, start_time, aspect = struct.unpack_from(HEADER_FORMAT,
+                                                                                       f.read(HEADER_SIZE))
+    if magic != MAGIC:
+        raise ValueError(f"{path} không phải file landmark trace")
+    dtype = record_dtype(max_hands)
+    if dtype.itemsize != record_size:
+        raise ValueError(f"Kích thước bản ghi không khớp ({record_size} != {dtype.itemsize})")
+    if os.path.getsize(path) <= HEADER_SIZE:
+        records = np.zeros(0, dtype=dtype)
+    else:
+        records = np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE)
+        if version < 3:
+            records = np.array(records)
+            records["sign"] *= -1.0
+    header = {"version": version, "max_hands": max_hands, "start_time": start_time,
+              "aspect": aspect if version >= 2 and aspect > 0 else 1.0}
+    return header, records
+
+
+def count_trace(records):
+    """Đếm ngón cho toàn bộ trace cùng lúc. Trả về (tổng số ngón mỗi khung, mask khung có tay)."""
+    n = records["n"].astype(np.int64)
+    lm = np.asarray(records["lm"])
+    frames, max_hands = lm.shape[:2]
+    extended = fingers_extended(lm.reshape(frames * max_hands, NUM_LANDMARKS, 3),
+                                np.asarray(records["sign"]).reshape(-1))
+    counts = extended.sum(axis=1).reshape(frames, max_hands)
+    # Bỏ các ô tay không tồn tại trong khung
+    counts *= np.arange(max_hands) < n[:, None]
+    return counts.sum(axis=1), n > 0
+
+
+def replay(records, debouncer=None, registry=None):
+    """Phát lại trace qua đếm ngón + debouncer + ánh xạ thiết bị như control_devices_by_fingers.
+
+    Trả về danh sách (t, tổng số ngón, trạng thái thiết bị) cho mỗi lần chốt cử chỉ.
+    """
+    debouncer = debouncer or GestureDebouncer()
+    registry = registry or load_registry()
+    totals, has_hand = count_trace(records)
+    times = np.asarray(records["t"], dtype=np.float64)
+    events = []
+    for i in np.flatnonzero(has_hand).tolist():
+        total = int(totals[i])
+        if debouncer.update(total, now=times[i]) is None:
+            continue
+        states = registry.states_for_fingers(total)
+        if states is not None:
+            events.append((float(times[i]), total, states))
+    return events
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(__doc__)
+        return 1
+    for path in argv:
+        header, records = load_trace(path)
+        debouncer = GestureDebouncer()
+        started = time.perf_counter()
+        events = replay(records, debouncer)
+        elapsed = time.perf_counter() - started
+        duration = float(records["t"][-1] - records["t"][0]) if len(records) else 0.0
+        speed = duration / elapsed if elapsed > 0 else float("inf")
+        print(f"{path}: {len(records)} khung, {duration:.1f}s ghi, phát lại {elapsed * 1000:.1f} ms "
+              f"(x{speed:.0f} thời gian thực), {len(events)} lần đổi trạng thái, "
+              f"{debouncer.commands_per_minute(duration):.1f} lệnh/phút")
+        for t, total, states in events:
+            on = [name for name, state in states.items() if state]
+            print(f"  {t:9.3f}s  {total:2d} ngón  bật: {', '.join(on) if on else '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import numpy as np
+
+NUM_LANDMARKS = 21
+TIP_IDS = np.array([4, 8, 12, 16, 20])
+# Khớp so sánh cho từng ngón: ngón cái so với khớp IP (tip - 1), các ngón khác so với khớp PIP (tip - 2)
+JOINT_IDS = np.array([3, 6, 10, 14, 18])
+
+
+def landmark_buffer(max_hands=2):
+    """Mảng dùng lại cho landmarks_to_array/count_fingers (out=...), tránh cấp phát mỗi khung."""
+    return np.empty((max_hands, NUM_LANDMARKS, 3), dtype=np.float32)
+
+
+def landmarks_to_array(multi_hand_landmarks, out=None):
+    """Chuyển toàn bộ bàn tay mediapipe thành mảng (số tay, 21, 3) float32, tọa độ chuẩn hóa.
+
+    Với out (xem landmark_buffer) kết quả là view vào out, chỉ hợp lệ tới lần gọi sau.
+    """
+    n = len(multi_hand_landmarks) if multi_hand_landmarks else 0
+    if out is None or out.shape[0] < n:
+        out = np.empty((n, NUM_LANDMARKS, 3), dtype=np.float32)
+    # Ghi từng giá trị vào view phẳng: không tạo list/tuple trung gian cho 21 điểm
+    flat = out.reshape(-1)
+    k = 0
+    for i in range(n):
+        for lm in multi_hand_landmarks[i].landmark:
+            flat[k] = lm.x
+            flat[k + 1] = lm.y
+            flat[k + 2] = lm.z
+            k += 3
+    return out[:n]
+
+
+def handedness_signs(multi_handedness, n):
+    """+1 cho nhãn "Left", -1 cho nhãn "Right".
+
+    Mediapipe gán nhãn như thể ảnh đã lật gương: trên khung không lật, tay phải thật của
+    người dùng có nhãn "Left" và khi lòng bàn tay hướng vào camera, ngón cái duỗi có
+    tip.x > IP.x. Lật khung thì x đổi chiều nhưng nhãn cũng đổi theo, nên bảng dấu giữ nguyên.
+    Thiếu thông tin handedness thì mặc định +1, tương đương phép so sánh ngón cái cũ.
+    """
+    signs = np.ones(n, dtype=np.float32)
+    if multi_handedness:
+        for i, hand in enumerate(multi_handedness[:n]):
+            if hand.classification[0].label == "Right":
+                signs[i] = -1.0
+    return signs
+
+
+def fingers_extended(lm, signs):
+    """Trả về mảng bool (số tay, 5): ngón nào đang duỗi, tính cho mọi bàn tay cùng lúc."""
+    tips = lm[:, TIP_IDS, :2]
+    joints = lm[:, JOINT_IDS, :2]
+    extended = np.empty((lm.shape[0], 5), dtype=bool)
+    # Ngón cái: so sánh theo trục x, chiều phụ thuộc tay trái/phải
+    extended[:, 0] = (tips[:, 0, 0] - joints[:, 0, 0]) * signs > 0
+    # Các ngón còn lại: đầu ngón cao hơn khớp PIP (y nhỏ hơn)
+    extended[:, 1:] = tips[:, 1:, 1] < joints[:, 1:, 1]
+    return extended
+
+
+def count_fingers(multi_hand_landmarks, multi_handedness=None, out=None):
+    """Đếm ngón cho mọi bàn tay. Trả về (landmarks (n, 21, 3), số ngón từng tay, tổng số ngón)."""
+    lm = landmarks_to_array(multi_hand_landmarks, out)
+    if lm.shape[0] == 0:
+        return lm, np.zeros(0, dtype=np.int64), 0
+    counts = fingers_extended(lm, handedness_signs(multi_handedness, lm.shape[0])).sum(axis=1)
+    return lm, counts, int(counts.sum())
@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+# --- License Config ---
+LICENSE_FILE = "license.json"
+LICENSE_TIERS = {
+    "Trial": 30 * 86400,
+    "Basic": 90 * 86400,
+    "Standard": 180 * 86400,
+    "Pro": 270 * 86400,
+    "Premium": 365 * 86400,
+    "VIP Vinh Vien": None,  # Lifetime
+    "test": 3600  # Test key: 1 hour
+}
+
+_machine_code = None
+
+def get_machine_code():
+    global _machine_code
+    if _machine_code is None:
+        mac = uuid.getnode()
+        _machine_code = ':'.join(['{:02X}'.format((mac >> ele) & 0xff)
+                                  for ele in range(40, -1, -8)])
+    return _machine_code
+
+class LicenseService:
+    """Đọc license.json một lần, giữ trạng thái trong bộ nhớ.
+
+    is_valid()/remaining()/label_text() không đọc file, gọi được từ mọi luồng.
+    check_for_changes() chỉ stat() file để phát hiện sửa đổi từ bên ngoài.
+    next_boundary_delay() cho biết bao lâu nữa nhãn thời hạn cần đổi
+    (phút tiếp theo với gói "test", ngày tiếp theo với các gói khác).
+    """
+
+    def __init__(self, path=LICENSE_FILE, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.exists = False
+        self.license_type = None
+        self.registered_time = None
+        self.expiration = None
+        self.reload()
+
+    def _stat_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        mtime = self._stat_mtime()
+        info = {}
+        if mtime is not None:
+            try:
+                with open(self.path, "r") as file:
+                    info = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Lỗi đọc license: {e}")
+        license_type = info.get("license_type")
+        registered_time = info.get("registered_time")
+        expiration = None
+        if license_type in LICENSE_TIERS and LICENSE_TIERS[license_type] is not None and registered_time is not None:
+            expiration = registered_time + LICENSE_TIERS[license_type]
+        with self._lock:
+            self._mtime = mtime
+            self.exists = mtime is not None
+            self.license_type = license_type
+            self.registered_time = registered_time
+            self.expiration = expiration
+
+    def check_for_changes(self):
+        """Nạp lại nếu file bị sửa/xóa từ bên ngoài. Trả về True nếu có thay đổi."""
+        if self._stat_mtime() == self._mtime:
+            return False
+        self.reload()
+        return True
+
+    def save(self, license_type):
+        data = {
+            "license_type": license_type,
+            "registered_time": int(self.clock()),
+            "machine_code": get_machine_code()
+        }
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+        self.reload()
+
+    def is_lifetime(self):
+        return self.license_type in LICENSE_TIERS and LICENSE_TIERS[self.license_type] is None
+
+    def is_valid(self, now=None):
+        if not self.exists or self.license_type not in LICENSE_TIERS:
+            return False
+        if self.is_lifetime():
+            return True  # Lifetime
+        if self.expiration is None:
+            return False
+        now = int(self.clock()) if now is None else now
+        return now < self.expiration
+
+    def remaining(self, now=None):
+        """Cùng kiểu giá trị với remaining_days() cũ: 0, "∞", "Xh Ym" hoặc số ngày."""
+        if not self.exists or self.license_type not in LICENSE_TIERS:
+            return 0
+        if self.is_lifetime():
+            return "∞"
+        if self.expiration is None:
+            return 0
+        now = int(self.clock()) if now is None else now
+        remaining_sec = self.expiration - now
+        if self.license_type == "test":
+            hours_left = remaining_sec // 3600
+            minutes_left = (remaining_sec % 3600) // 60
+            if hours_left < 0:
+                return 0
+            return f"{hours_left}h {minutes_left}m"
+        remaining = remaining_sec // 86400
+        return max(0, remaining)
+
+    def label_text(self, now=None):
+        days = self.remaining(now)
+        if days == "∞":
+            return "Thời hạn còn lại: Vĩnh viễn"
+        elif isinstance(days, str) and "h" in days:
+            return f"Thời hạn còn lại: {days}"
+        return f"Thời hạn còn lại: {days} ngày"
+
+    def next_boundary_delay(self, now=None):
+        """Số giây tới lần nhãn thời hạn đổi giá trị, None nếu không bao giờ đổi."""
+        if not self.is_valid(now) or self.is_lifetime():
+            return None
+        now = self.clock() if now is None else now
+        remaining_sec = self.expiration - now
+        unit = 60 if self.license_type == "test" else 86400
+        delay = remaining_sec % unit
+        return delay if delay > 0 else unit
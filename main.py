@@ -1,99 +1,254 @@
-import cv2
-import mediapipe as mp
 import time
-import numpy as np
+START_TIME = time.perf_counter()
+import os
 import threading
 from ui import SmartHomeApp
 import tkinter as tk
-from PIL import ImageFont, ImageDraw, Image
+from pipeline import FramePipeline
+from gesture import GestureDebouncer
+from metrics import Instrumentation, JsonlDumper
+from controller import DeviceDispatcher, make_transport
+from devices import load_registry
+from journal import JOURNAL_DIR, DeviceJournal
+# cv2, mediapipe, numpy, Pillow được import trong luồng nền để cửa sổ Tk hiện ra trước
 
 # Đường dẫn tới font Unicode tiếng Việt
 FONT_PATH = "C:/Windows/Fonts/arial.ttf"  # Thay đổi cho phù hợp nếu dùng font khác
 
-def draw_text_unicode(img_cv, text, position, font_size=40, color=(255, 0, 0)):
-    """Vẽ chữ Unicode lên ảnh OpenCV bằng Pillow."""
-    img_pil = Image.fromarray(cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB))
-    draw = ImageDraw.Draw(img_pil)
-    try:
-        font = ImageFont.truetype(FONT_PATH, font_size)
-    except Exception as e:
-        font = ImageFont.load_default()
-        print(f"Lỗi load font: {e}. Sử dụng font mặc định.")
-    draw.text(position, text, font=font, fill=color[::-1])
-    return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+_overlay = None
+
+def get_overlay():
+    """OverlayRenderer dùng chung, tạo lần đầu khi cần (kéo theo import cv2/Pillow)."""
+    global _overlay
+    if _overlay is None:
+        from overlay import OverlayRenderer
+        _overlay = OverlayRenderer(FONT_PATH)
+    return _overlay
+
+# Thống kê hiệu năng: tắt bằng STATS_ENABLED=0, ghi JSON-lines ra file bằng STATS_JSONL=<đường dẫn>
+stats = Instrumentation(enabled=os.environ.get("STATS_ENABLED", "1") != "0")
 
 def control_devices_by_fingers(app, total):
-    app.set_device_states(False, False, False, False, False)
-    if total == 1:
-        app.set_device_states(True, False, False, False, False)
-    elif total == 2:
-        app.set_device_states(False, True, False, False, False)
-    elif total == 3:
-        app.set_device_states(False, False, True, False, False)
-    elif total == 4:
-        app.set_device_states(False, False, False, True, False)
-    elif total == 5:
-        app.set_device_states(False, False, False, False, True)
-
-def ai_finger_recognition_loop(app):
-    time.sleep(2.0)
+    # Chỉ đẩy trạng thái mong muốn; luồng Tk sẽ so sánh và cập nhật widget cần đổi
+    # Trạng thái license nằm sẵn trong bộ nhớ, không đọc file trong vòng lặp nhận diện
+    if app.journal is not None:
+        app.journal.gesture(f"{total} ngón")
+    if not app.license.is_valid():
+        app.device_bus.post_message("License đã hết hạn, vui lòng kích hoạt để điều khiển bằng cử chỉ")
+        return
+    states = app.registry.states_for_fingers(total)
+    if states is not None:
+        app.device_bus.publish(states)
+
+def control_devices_by_gesture(app, engine, name):
+    if app.journal is not None:
+        app.journal.gesture(name)
+    if not app.license.is_valid():
+        return
+    states = engine.library.binding_states(name)
+    if states is not None:
+        app.device_bus.publish(states)
+        app.device_bus.post_message(f"Cử chỉ: {name}")
+
+def process_frame(hands, app, image, debouncer, frontend, recorder=None, engine=None, lm_buffer=None):
+    """Tầng suy luận: nhận diện bàn tay, đếm ngón và điều khiển thiết bị.
+
+    image (BGR) không bị sửa; lm_buffer (landmarks.landmark_buffer) nhận landmark của khung.
+    """
+    from landmarks import count_fingers
+    t = stats.mark()
+    image_rgb = frontend.prepare(image)
+    if image_rgb is None:
+        # Cảnh tĩnh hoặc đang ở chế độ chờ: dùng lại kết quả lần trước
+        stats.count("skipped_frames")
+        return image, frontend.last_hands, frontend.last_total
+    image_rgb.flags.writeable = False
+    t = stats.record("convert", t)
+    results = hands.process(image_rgb)
+    t = stats.record("process", t)
+    hand_list = results.multi_hand_landmarks or []
+    total = None
+    lm = None
+    if hand_list:
+        frontend.map_back(hand_list)
+        # Đếm ngón cho tất cả bàn tay cùng lúc, tổng số ngón có thể từ 0 tới 10
+        lm, counts, total = count_fingers(hand_list, results.multi_handedness, lm_buffer)
+        t = stats.record("landmarks", t)
+        if "first_detection" not in stats.events:
+            stats.event("first_detection", time.perf_counter() - START_TIME)
+            print(f"Thời gian tới lần nhận diện đầu tiên: {stats.events['first_detection']:.2f}s")
+        stats.count("hand_frames")
+        seen = None
+        if engine is not None:
+            # Cử chỉ theo mẫu được ưu tiên; khung nhận ra cử chỉ mẫu không dùng để đếm ngón
+            # lm chuẩn hóa theo khung gốc (sau map_back) nên dùng tỉ lệ của khung gốc
+            seen, committed = engine.update(lm, results.multi_handedness, image.shape[1] / image.shape[0])
+            if committed is not None:
+                control_devices_by_gesture(app, engine, committed)
+        # Chỉ gửi lệnh khi số ngón đã ổn định và thực sự đổi
+        if seen is None and debouncer.update(total) is not None:
+            control_devices_by_fingers(app, total)
+            stats.record("dispatch", t)
+            stats.count("commands")
+    elif engine is not None:
+        engine.update(None)
+    frontend.update(lm, image.shape, hand_list, total)
+    if recorder is not None:
+        recorder.record(lm, results.multi_handedness)
+    return image, hand_list, total
+
+_layers_cache = {}
+
+def overlay_layers(total):
+    """Nền + chữ của một khung hình, để vẽ trong một lượt bằng overlay.draw."""
+    layers = _layers_cache.get(total)
+    if layers is None:
+        layers = _layers_cache[total] = _build_overlay_layers(total)
+    return layers
+
+def _build_overlay_layers(total):
+    boxes = [((20, 15), (430, 65), (0, 255, 0))]
+    texts = [("Nhận diện bàn tay", (30, 20), 34, (255, 0, 0))]
+    if total is not None:
+        boxes.append(((20, 300), (320, 425), (0, 255, 0)))
+        texts.append((f"{total} ngón", (45, 340), 60, (255, 0, 0)))
+    return boxes, texts
+
+def render_frame(app, mp_draw, mp_hand, result):
+    """Tầng hiển thị: vẽ kết quả lên khung hình và gửi sang khung xem trước trong cửa sổ Tk."""
+    if app.closing.is_set():
+        return False
+    if result is not None and app.preview.active:
+        t = stats.mark()
+        image, hand_list, total = result
+        for myHands in hand_list:
+            mp_draw.draw_landmarks(image, myHands, mp_hand.HAND_CONNECTIONS)
+        get_overlay().draw(image, *overlay_layers(total))
+        t = stats.record("overlay", t)
+        app.preview.submit(image)
+        stats.record("display", t)
+    return True
+
+def open_camera(index, holder):
+    import cv2
+    video = cv2.VideoCapture(index)
+    # Chỉ giữ 1 khung trong bộ đệm của driver để tránh đọc phải ảnh cũ
+    video.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    holder["video"] = video
+
+def load_hands_model():
+    """Import mediapipe, tạo Hands và chạy thử một khung trống để nạp xong mô hình."""
+    import mediapipe as mp
+    import numpy as np
+    hands = mp.solutions.hands.Hands(max_num_hands=2,
+                                     min_detection_confidence=0.5,
+                                     min_tracking_confidence=0.5)
+    hands.process(np.zeros((240, 320, 3), dtype=np.uint8))
+    return mp, hands
+
+def ai_finger_recognition_loop(app, render_fps=None, debouncer=None, frontend=None, camera_index=0):
+    app.device_bus.post_message("Đang tải mô hình nhận diện...")
+    # Mở camera song song với việc import mediapipe và nạp mô hình
+    holder = {}
+    camera_thread = threading.Thread(target=open_camera, args=(camera_index, holder), daemon=True)
+    camera_thread.start()
+    mp, hands = load_hands_model()
+    from frontend import AdaptiveFrontEnd
+    from landmarks import landmark_buffer
+    get_overlay()
+    camera_thread.join()
+    video = holder["video"]
+    stats.event("model_ready", time.perf_counter() - START_TIME)
+    app.device_bus.post_message(f"Sẵn sàng nhận diện ({stats.events['model_ready']:.1f}s)")
     mp_draw = mp.solutions.drawing_utils
     mp_hand = mp.solutions.hands
-    tipIds = [4, 8, 12, 16, 20]
-    video = cv2.VideoCapture(0)
-
-    # Tên cửa sổ có dấu tiếng Việt, sẽ chỉ hiện đúng nếu hệ điều hành và Python hỗ trợ
-    window_name = "Hand Detection"
-
-    # Tạo cửa sổ trước (giúp hiển thị Unicode tốt hơn trên nhiều hệ điều hành)
-    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-
-    with mp_hand.Hands(min_detection_confidence=0.5,
-                       min_tracking_confidence=0.5) as hands:
-        while True:
-            ret, image = video.read()
-            if not ret:
-                continue
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            image_rgb.flags.writeable = False
-            results = hands.process(image_rgb)
-            image_rgb.flags.writeable = True
-            image = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
-            lmList = []
-            if results.multi_hand_landmarks:
-                myHands = results.multi_hand_landmarks[0]
-                for id, lm in enumerate(myHands.landmark):
-                    h, w, c = image.shape
-                    cx, cy = int(lm.x * w), int(lm.y * h)
-                    lmList.append([id, cx, cy])
-                mp_draw.draw_landmarks(image, myHands, mp_hand.HAND_CONNECTIONS)
-            fingers = []
-            if len(lmList) != 0:
-                # Xử lý ngón cái
-                if lmList[tipIds[0]][1] > lmList[tipIds[0] - 1][1]:
-                    fingers.append(1)
-                else:
-                    fingers.append(0)
-                for id in range(1, 5):
-                    if lmList[tipIds[id]][2] < lmList[tipIds[id] - 2][2]:
-                        fingers.append(1)
-                    else:
-                        fingers.append(0)
-                total = fingers.count(1)
-                control_devices_by_fingers(app, total)
-                cv2.rectangle(image, (20, 300), (320, 425), (0, 255, 0), cv2.FILLED)
-                image = draw_text_unicode(image, f"{total} ngón", (45, 340), font_size=60, color=(255, 0, 0))
-            # Vẽ tiêu đề vào ảnh bằng font đẹp
-            cv2.rectangle(image, (20, 15), (430, 65), (0, 255, 0), cv2.FILLED)
-            image = draw_text_unicode(image, "Nhận diện bàn tay", (30, 20), font_size=34, color=(255, 0, 0))
-            cv2.imshow(window_name, image)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+    debouncer = debouncer or GestureDebouncer()
+    frontend = frontend or AdaptiveFrontEnd()
+    # GESTURE_LIBRARY=<file .npz>: mẫu cử chỉ (mặc định gestures.npz nếu có)
+    from gesture_templates import GESTURE_LIBRARY_FILE, load_engine
+    engine = load_engine(os.environ.get("GESTURE_LIBRARY", GESTURE_LIBRARY_FILE))
+    # TRACE_PATH=<file>: ghi landmark mọi khung để phát lại bằng python -m landmark_trace
+    recorder = None
+    if os.environ.get("TRACE_PATH"):
+        from landmark_trace import TraceRecorder
+        import cv2
+        width, height = video.get(cv2.CAP_PROP_FRAME_WIDTH), video.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        recorder = TraceRecorder(os.environ["TRACE_PATH"], aspect=width / height if width and height else 1.0)
+    # Landmark mỗi khung ghi vào cùng một mảng; thời gian dừng của gc hiện trong thống kê (tầng "gc")
+    lm_buffer = landmark_buffer()
+    stats.watch_gc()
+
+    with hands:
+        pipeline = FramePipeline(
+            video,
+            process=lambda image: process_frame(hands, app, image, debouncer, frontend, recorder, engine,
+                                                lm_buffer),
+            render=lambda result: render_frame(app, mp_draw, mp_hand, result),
+            render_fps=render_fps or app.preview_fps,
+            stats=stats,
+            interval=frontend.frame_interval,
+        )
+        # Chạy tới khi đóng cửa sổ; các luồng capture/inference được dừng và join khi thoát
+        pipeline.run()
     video.release()
-    cv2.destroyAllWindows()
+    if recorder is not None:
+        recorder.close()
+
+
+def multi_camera_loop(app, specs):
+    """Nhận diện trên nhiều nguồn, mỗi nguồn một tiến trình (xem multicam.py)."""
+    from multicam import MultiCameraCoordinator, parse_source
+    sources = [parse_source(spec) for spec in specs]
+    app.device_bus.post_message(f"Đang khởi động {len(sources)} camera...")
+
+    def on_decision(total, camera_index):
+        stats.count("commands")
+        control_devices_by_fingers(app, total)
+
+    def on_frame(camera_index, frame, record):
+        # Khung trong shared memory: preview.submit copy ngay nên không giữ tham chiếu
+        if camera_index == 0:
+            app.preview.submit(frame)
+
+    coordinator = MultiCameraCoordinator(sources, on_decision, on_frame)
+    coordinator.run(app.closing)
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = SmartHomeApp(root)
-    threading.Thread(target=ai_finger_recognition_loop, args=(app,), daemon=True).start()
-    root.mainloop()
\ No newline at end of file
+    # DEVICE_PORT: "mock" (mặc định), "fake" (Arduino giả lập) hoặc tên cổng serial, ví dụ COM3
+    registry = load_registry()
+    codes = registry.device_codes()
+    dispatcher = DeviceDispatcher(make_transport(os.environ.get("DEVICE_PORT"), codes, registry.hooks()), device_codes=codes)
+    # JOURNAL_DIR: thư mục nhật ký thiết bị (mặc định journal/), "0" để tắt
+    journal = None
+    if os.environ.get("JOURNAL_DIR") != "0":
+        journal = DeviceJournal(os.environ.get("JOURNAL_DIR", JOURNAL_DIR))
+        journal.start()
+    app = SmartHomeApp(root, dispatcher=dispatcher, registry=registry, journal=journal)
+    app.attach_stats(stats)
+    # API_PORT=<cổng>: bật API HTTP/WebSocket cục bộ (xem api.py); API_HOST mặc định 127.0.0.1
+    api_server = None
+    if os.environ.get("API_PORT"):
+        from api import API_HOST, ControlServer
+        api_server = ControlServer(app, os.environ.get("API_HOST", API_HOST), int(os.environ["API_PORT"]))
+        api_server.start()
+    # Vẽ cửa sổ ngay rồi mới khởi động phần nhận diện
+    root.update()
+    stats.event("first_window", time.perf_counter() - START_TIME)
+    print(f"Thời gian tới khi hiện cửa sổ: {stats.events['first_window']:.2f}s")
+    if os.environ.get("STATS_JSONL"):
+        JsonlDumper(stats, os.environ["STATS_JSONL"]).start()
+    # CAMERAS="0,1,video.mp4": nhiều nguồn chạy song song; một nguồn thì dùng pipeline một camera
+    specs = [s.strip() for s in os.environ.get("CAMERAS", "0").split(",") if s.strip()] or ["0"]
+    if len(specs) > 1:
+        threading.Thread(target=multi_camera_loop, args=(app, specs), daemon=True).start()
+    else:
+        camera_index = int(specs[0]) if specs[0].isdigit() else specs[0]
+        threading.Thread(target=ai_finger_recognition_loop, args=(app,), kwargs={"camera_index": camera_index},
+                         daemon=True).start()
+    root.mainloop()
+    if api_server is not None:
+        api_server.stop()
+    dispatcher.close()
+    if journal is not None:
+        journal.stop()
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from array import array
+
+# Các tầng được đo trong vòng lặp nhận diện
+STAGES = ("capture", "convert", "process", "landmarks", "overlay", "display", "dispatch")
+# Không phải một tầng của khung hình: thời gian mỗi lần gc thu gom (xem watch_gc)
+GC_STAGE = "gc"
+
+
+class RingBuffer:
+    """Bộ đệm vòng kích thước cố định, ghi đè mẫu cũ nhất, không cấp phát khi ghi."""
+
+    def __init__(self, size):
+        self.data = array("d", bytes(8 * size))
+        self.size = size
+        self.index = 0
+        self.count = 0
+
+    def append(self, value):
+        self.data[self.index] = value
+        self.index = (self.index + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def values(self):
+        return self.data[:self.count] if self.count < self.size else self.data
+
+
+class Instrumentation:
+    """Bộ đếm thời gian từng tầng + bộ đếm sự kiện cho vòng lặp nhận diện.
+
+    Dùng:
+        t = stats.mark()
+        ...
+        t = stats.record("process", t)
+
+    Khi enabled=False, mark()/record() trả về ngay, gần như không tốn chi phí.
+    """
+
+    def __init__(self, stages=STAGES, size=256, enabled=True):
+        self.enabled = enabled
+        self.stages = tuple(stages)
+        self.timings = {stage: RingBuffer(size) for stage in self.stages + (GC_STAGE,)}
+        self.frame_times = RingBuffer(size)
+        self.counters = {}
+        self.events = {}
+        self.gc_collections = 0
+        self._gc_start = 0.0
+        self._lock = threading.Lock()
+
+    def mark(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+    def record(self, stage, t0):
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        self.timings[stage].append((now - t0) * 1000.0)
+        return now
+
+    def frame_done(self):
+        if self.enabled:
+            self.frame_times.append(time.perf_counter())
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def watch_gc(self):
+        """Đo thời gian dừng của mỗi lần gc thu gom (tầng "gc") qua gc.callbacks."""
+        import gc
+        if self.enabled and self._on_gc not in gc.callbacks:
+            gc.callbacks.append(self._on_gc)
+
+    def _on_gc(self, phase, info):
+        # Có thể chạy giữa lúc luồng khác đang giữ self._lock nên không dùng count()
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+        else:
+            self.timings[GC_STAGE].append((time.perf_counter() - self._gc_start) * 1000.0)
+            self.gc_collections += 1
+
+    def fps(self):
+        times = self.frame_times.values()
+        if len(times) < 2:
+            return 0.0
+        span = max(times) - min(times)
+        return (len(times) - 1) / span if span > 0 else 0.0
+
+    def event(self, name, seconds):
+        """Ghi lại một mốc thời gian một lần (ví dụ thời gian khởi động)."""
+        self.events[name] = round(seconds, 3)
+
+    def snapshot(self):
+        import numpy as np  # chỉ cần khi xuất thống kê, không làm chậm lúc khởi động
+        stages = {}
+        for stage, ring in self.timings.items():
+            values = ring.values()
+            if len(values) == 0:
+                continue
+            p50, p95, p99 = np.percentile(np.frombuffer(values, dtype=np.float64), [50, 95, 99])
+            stages[stage] = {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+        with self._lock:
+            counters = dict(self.counters)
+        if self.gc_collections:
+            counters["gc_collections"] = self.gc_collections
+        return {"time": time.time(), "fps": round(self.fps(), 2), "stages_ms": stages, "counters": counters,
+                "events": dict(self.events)}
+
+    def summary_text(self):
+        """Một dòng ngắn để hiển thị trên dashboard."""
+        if not self.enabled:
+            return "Thống kê: tắt"
+        snap = self.snapshot()
+        parts = [f"FPS: {snap['fps']:.1f}"]
+        process = snap["stages_ms"].get("process")
+        if process:
+            parts.append(f"Nhận diện p50/p95: {process['p50']:.1f}/{process['p95']:.1f} ms")
+        total = sum(s["p50"] for stage, s in snap["stages_ms"].items() if stage != GC_STAGE)
+        if total:
+            parts.append(f"Tổng p50: {total:.1f} ms")
+        return " | ".join(parts)
+
+
+class JsonlDumper(threading.Thread):
+    """Luồng nền ghi snapshot thống kê ra file JSON-lines theo chu kỳ."""
+
+    def __init__(self, stats, path, interval=5.0):
+        super().__init__(name="stats-dump", daemon=True)
+        self.stats = stats
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            if not self.stats.enabled:
+                continue
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.stats.snapshot(), ensure_ascii=False) + "\n")
+
+    def stop(self):
+        self.stop_event.set()
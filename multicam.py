@@ -0,0 +1,282 @@
+"""Nhận diện trên nhiều camera: mỗi nguồn một tiến trình riêng với Hands riêng.
+
+Khung hình và kết quả landmark được trao đổi qua vòng đệm multiprocessing.shared_memory
+(không pickle). Bộ điều phối ở tiến trình chính gộp quyết định cử chỉ của các camera
+thành một luồng trạng thái thiết bị duy nhất.
+
+Chạy thử không cần GUI (nguồn là chỉ số camera hoặc file video):
+    python -m multicam 0 1
+    python -m multicam video_a.mp4 video_b.mp4
+"""
+import multiprocessing as mproc
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from landmarks import NUM_LANDMARKS
+
+SLOTS = 4
+MAX_HANDS = 2
+DEFAULT_FRAME_SHAPE = (480, 640)
+# spawn trên mọi nền tảng: tiến trình chính đang có luồng Tk/camera, fork không an toàn
+CONTEXT = mproc.get_context("spawn")
+RESULT_DTYPE = np.dtype([
+    ("seq", "<i8"),       # -1: ô trống hoặc đang ghi (seqlock); số thứ tự được ghi sau cùng
+    ("t", "<f8"),
+    ("n", "<i4"),
+    ("total", "<i4"),     # -1 nếu không thấy tay
+    ("committed", "<i4"), # số ngón vừa được debouncer chốt, -1 nếu không có
+    ("sign", "<f4", (MAX_HANDS,)),
+    ("lm", "<f4", (MAX_HANDS, NUM_LANDMARKS, 3)),
+])
+
+
+def parse_source(text):
+    """"0" -> camera 0, còn lại là đường dẫn file video."""
+    text = text.strip()
+    return int(text) if text.isdigit() else text
+
+
+def shared_array(shape, dtype, name=None):
+    """Tạo (name=None) hoặc gắn vào một vùng shared memory, trả về (shm, ndarray trên vùng đó)."""
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    shm = shared_memory.SharedMemory(name=name, create=name is None, size=nbytes if name is None else 0)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def camera_worker(source, frame_shape, frames_name, results_name, stop_event, realtime=True):
+    """Tiến trình camera: đọc khung, chạy Hands, đếm ngón, debounce, ghi vào vòng đệm chung."""
+    import cv2
+    import mediapipe as mp
+    from gesture import GestureDebouncer
+    from landmarks import count_fingers, handedness_signs
+
+    h, w = frame_shape
+    frames_shm, frames = shared_array((SLOTS, h, w, 3), np.uint8, frames_name)
+    results_shm, results = shared_array((SLOTS,), RESULT_DTYPE, results_name)
+    video = cv2.VideoCapture(source)
+    is_file = isinstance(source, str)
+    frame_interval = 0.0
+    if is_file and realtime:
+        fps = video.get(cv2.CAP_PROP_FPS)
+        frame_interval = 1.0 / fps if fps and fps > 0 else 0.0
+    debouncer = GestureDebouncer()
+    rgb = np.empty((h, w, 3), dtype=np.uint8)
+    seq = 0
+    try:
+        with mp.solutions.hands.Hands(max_num_hands=MAX_HANDS,
+                                      min_detection_confidence=0.5,
+                                      min_tracking_confidence=0.5) as hands:
+            next_frame = time.monotonic()
+            while not stop_event.is_set():
+                ret, frame = video.read()
+                if not ret:
+                    if is_file:
+                        # Hết video thì phát lại từ đầu
+                        video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    else:
+                        time.sleep(0.01)
+                    continue
+                k = seq % SLOTS
+                # Seqlock: đánh dấu ô đang ghi trước khi đụng vào khung/kết quả của nó
+                results["seq"][k] = -1
+                slot = frames[k]
+                if frame.shape[:2] != (h, w):
+                    cv2.resize(frame, (w, h), dst=slot, interpolation=cv2.INTER_AREA)
+                else:
+                    np.copyto(slot, frame)
+                cv2.cvtColor(slot, cv2.COLOR_BGR2RGB, dst=rgb)
+                results_mp = hands.process(rgb)
+                hand_list = results_mp.multi_hand_landmarks or []
+                total, committed, n = -1, -1, 0
+                if hand_list:
+                    lm, counts, total = count_fingers(hand_list, results_mp.multi_handedness)
+                    n = min(len(lm), MAX_HANDS)
+                    results["lm"][k, :n] = lm[:n]
+                    results["sign"][k, :n] = handedness_signs(results_mp.multi_handedness, n)
+                    value = debouncer.update(total)
+                    if value is not None:
+                        committed = value
+                results["t"][k] = time.time()
+                results["n"][k] = n
+                results["total"][k] = total
+                results["committed"][k] = committed
+                results["seq"][k] = seq
+                seq += 1
+                if frame_interval:
+                    next_frame += frame_interval
+                    delay = next_frame - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_frame = time.monotonic()
+    finally:
+        video.release()
+        del frames, results
+        frames_shm.close()
+        results_shm.close()
+
+
+class CameraChannel:
+    """Phía tiến trình chính của một camera: vùng nhớ chung + tiến trình worker."""
+
+    def __init__(self, index, source, frame_shape, stop_event, realtime=True):
+        self.index = index
+        self.source = source
+        h, w = frame_shape
+        self.frames_shm, self.frames = shared_array((SLOTS, h, w, 3), np.uint8)
+        self.results_shm, self.results = shared_array((SLOTS,), RESULT_DTYPE)
+        self.results["seq"] = -1
+        self.last_seq = -1
+        self.process = CONTEXT.Process(
+            target=camera_worker,
+            args=(source, frame_shape, self.frames_shm.name, self.results_shm.name, stop_event, realtime),
+            name=f"camera-{index}",
+            daemon=True,
+        )
+
+    def poll(self):
+        """Bản ghi mới nhất (bản sao) nếu có dữ liệu mới kể từ lần poll trước, ngược lại None."""
+        seqs = self.results["seq"]
+        k = int(seqs.argmax())
+        seq = int(seqs[k])
+        if seq <= self.last_seq:
+            return None
+        record = self.results[k].copy()
+        if int(self.results["seq"][k]) != seq:
+            # Worker bắt đầu ghi đè ô này (seq = -1) trong lúc copy, bỏ qua để lần poll sau đọc lại
+            return None
+        # Các khung bị bỏ qua giữa hai lần poll có thể chứa lần chốt cử chỉ;
+        # mỗi ô chỉ được tính khi seq không đổi trước và sau khi đọc committed
+        committed = []
+        for j in range(SLOTS):
+            before = int(self.results["seq"][j])
+            value = int(self.results["committed"][j])
+            if self.last_seq < before < seq and value >= 0 and int(self.results["seq"][j]) == before:
+                committed.append((before, value))
+        committed = [value for _, value in sorted(committed)]
+        self.last_seq = seq
+        return k, record, committed
+
+    def close(self):
+        del self.frames, self.results
+        self.frames_shm.close()
+        self.results_shm.close()
+        self.frames_shm.unlink()
+        self.results_shm.unlink()
+
+
+class MultiCameraCoordinator:
+    """Chạy một worker mỗi nguồn và gộp các quyết định cử chỉ.
+
+    Quy tắc gộp: lần chốt mới nhất của bất kỳ camera nào được áp dụng, trừ khi nó trùng với
+    giá trị vừa áp dụng hoặc xảy ra trong min_interval giây sau lần áp dụng trước
+    (tránh hai camera thấy khác nhau làm thiết bị bật/tắt qua lại).
+
+    on_decision(total, camera_index) được gọi trên luồng chạy run();
+    on_frame(camera_index, frame, record) nhận khung mới nhất của mỗi camera (view vào shared memory).
+    """
+
+    def __init__(self, sources, on_decision, on_frame=None, frame_shape=DEFAULT_FRAME_SHAPE,
+                 min_interval=0.5, poll_interval=0.01, realtime=True):
+        self.sources = list(sources)
+        self.on_decision = on_decision
+        self.on_frame = on_frame
+        self.frame_shape = frame_shape
+        self.min_interval = min_interval
+        self.poll_interval = poll_interval
+        self.realtime = realtime
+        self.stop_event = CONTEXT.Event()
+        self.channels = []
+        self.last_total = None
+        self.last_decision_time = 0.0
+        self.pending = None
+        self.decisions = 0
+
+    def start(self):
+        for i, source in enumerate(self.sources):
+            channel = CameraChannel(i, source, self.frame_shape, self.stop_event, self.realtime)
+            channel.process.start()
+            self.channels.append(channel)
+
+    def merge(self, camera_index, total, now):
+        # Quyết định mới nhất thay quyết định đang chờ; áp dụng ngay nếu đã qua min_interval
+        self.pending = (total, camera_index)
+        self.apply_pending(now)
+
+    def apply_pending(self, now):
+        if self.pending is None:
+            return
+        total, camera_index = self.pending
+        if total == self.last_total:
+            self.pending = None
+            return
+        if now - self.last_decision_time < self.min_interval:
+            return
+        self.pending = None
+        self.last_total = total
+        self.last_decision_time = now
+        self.decisions += 1
+        self.on_decision(total, camera_index)
+
+    def poll(self):
+        now = time.monotonic()
+        for channel in self.channels:
+            polled = channel.poll()
+            if polled is None:
+                continue
+            k, record, committed = polled
+            if record["committed"] >= 0:
+                committed.append(int(record["committed"]))
+            if committed:
+                self.merge(channel.index, committed[-1], now)
+            if self.on_frame is not None:
+                self.on_frame(channel.index, channel.frames[k], record)
+        self.apply_pending(now)
+
+    def run(self, stop=None):
+        """Vòng điều phối; dừng khi stop (threading.Event) được set hoặc mọi worker đã thoát."""
+        if not self.channels:
+            self.start()
+        try:
+            while not (stop is not None and stop.is_set()):
+                self.poll()
+                if not any(c.process.is_alive() for c in self.channels):
+                    break
+                time.sleep(self.poll_interval)
+        finally:
+            self.stop()
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        for channel in self.channels:
+            channel.process.join(timeout)
+            if channel.process.is_alive():
+                channel.process.terminate()
+            channel.close()
+        self.channels = []
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(__doc__)
+        return 1
+
+    def on_decision(total, camera_index):
+        print(f"[camera {camera_index}] {total} ngón")
+
+    coordinator = MultiCameraCoordinator([parse_source(a) for a in argv], on_decision)
+    try:
+        coordinator.run()
+    except KeyboardInterrupt:
+        pass
+    print(f"{coordinator.decisions} quyết định")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
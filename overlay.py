@@ -0,0 +1,88 @@
+import os
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import ImageFont, ImageDraw, Image
+
+# Font đi kèm repo, dùng khi không tìm thấy font hệ thống
+LOCAL_FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "arial.ttf")
+
+
+class OverlayRenderer:
+    """Vẽ chữ Unicode lên khung hình bằng sprite RGBA dựng sẵn (cache LRU)."""
+
+    def __init__(self, font_path, max_sprites=64):
+        self.font_path = font_path
+        self.max_sprites = max_sprites
+        self._fonts = {}
+        self._sprites = OrderedDict()
+        # Bộ đệm float32 dùng lại cho phép blend, chỉ lớn lên khi gặp sprite lớn hơn
+        self._scratch = np.empty(0, dtype=np.float32)
+
+    def get_font(self, font_size):
+        font = self._fonts.get(font_size)
+        if font is None:
+            for path in (self.font_path, LOCAL_FONT_PATH):
+                try:
+                    font = ImageFont.truetype(path, font_size)
+                    break
+                except Exception as e:
+                    print(f"Lỗi load font {path}: {e}")
+            if font is None:
+                font = ImageFont.load_default()
+                print("Sử dụng font mặc định.")
+            self._fonts[font_size] = font
+        return font
+
+    def get_sprite(self, text, font_size, color):
+        key = (text, font_size, tuple(color))
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            return sprite
+        font = self.get_font(font_size)
+        left, top, right, bottom = font.getbbox(text)
+        width, height = max(1, right - left), max(1, bottom - top)
+        img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        # Màu truyền vào theo thứ tự BGR nên vẽ thẳng, mảng kết quả đã là BGR
+        ImageDraw.Draw(img).text((-left, -top), text, font=font, fill=tuple(color) + (255,))
+        rgba = np.asarray(img, dtype=np.float32)
+        alpha = rgba[:, :, 3:4] / 255.0
+        # Lưu sẵn màu nhân alpha và (1 - alpha) để lúc blend chỉ còn nhân + cộng
+        sprite = (left, top, rgba[:, :, :3] * alpha, 1.0 - alpha)
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.max_sprites:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def blit_text(self, image, text, position, font_size=40, color=(255, 0, 0)):
+        """Alpha-blend sprite của chữ trực tiếp vào vùng tương ứng của image."""
+        left, top, premul, inv_alpha = self.get_sprite(text, font_size, color)
+        h, w = image.shape[:2]
+        x0, y0 = position[0] + left, position[1] + top
+        sh, sw = premul.shape[:2]
+        # Cắt sprite theo biên khung hình
+        cx0, cy0 = max(0, -x0), max(0, -y0)
+        cx1, cy1 = min(sw, w - x0), min(sh, h - y0)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return image
+        roi = image[y0 + cy0:y0 + cy1, x0 + cx0:x0 + cx1]
+        if self._scratch.size < roi.size:
+            self._scratch = np.empty(roi.size, dtype=np.float32)
+        blended = self._scratch[:roi.size].reshape(roi.shape)
+        np.multiply(roi, inv_alpha[cy0:cy1, cx0:cx1], out=blended)
+        blended += premul[cy0:cy1, cx0:cx1]
+        np.copyto(roi, blended, casting="unsafe")
+        return image
+
+    def draw(self, image, boxes=(), texts=()):
+        """Vẽ một lượt: toàn bộ nền chữ nhật trước, sau đó tới các nhãn chữ.
+
+        boxes: [(pt1, pt2, color)], texts: [(text, position, font_size, color)]
+        """
+        for pt1, pt2, color in boxes:
+            cv2.rectangle(image, pt1, pt2, color, cv2.FILLED)
+        for text, position, font_size, color in texts:
+            self.blit_text(image, text, position, font_size, color)
+        return image
@@ -0,0 +1,172 @@
+import queue
+import threading
+import time
+
+from metrics import Instrumentation
+
+
+class LatestFrameSlot:
+    """Bộ đệm một ô: luôn giữ khung hình mới nhất, khung cũ chưa đọc sẽ bị ghi đè."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, item):
+        """Trả về khung cũ bị ghi đè (None nếu ô đang trống) để trả lại FramePool."""
+        with self._cond:
+            replaced = self._item
+            if replaced is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+            return replaced
+
+    def get(self, timeout=None):
+        with self._cond:
+            if self._item is None:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+
+def put_latest(q, item):
+    """Đưa item vào hàng đợi có giới hạn, bỏ phần tử cũ nhất nếu đã đầy; trả về các phần tử bị bỏ."""
+    dropped = []
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                dropped.append(q.get_nowait())
+            except queue.Empty:
+                pass
+
+
+class FramePool:
+    """Các mảng khung hình cấp phát sẵn, dùng lại qua VideoCapture.read(image=...).
+
+    Mỗi khung thuộc đúng một chỗ tại một thời điểm (camera đang ghi, ô LatestFrameSlot,
+    luồng suy luận, hàng đợi kết quả, tầng hiển thị) và được release() khi bị bỏ hoặc vẽ xong.
+    acquire() trả về None khi chưa đủ bộ đệm (lần đầu, hoặc kích thước khung đổi):
+    khi đó VideoCapture tự cấp phát và mảng mới được giữ lại lúc release.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._free = []
+        self._lock = threading.Lock()
+        self.allocations = 0
+
+    def acquire(self):
+        with self._lock:
+            return self._free.pop() if self._free else None
+
+    def release(self, frame):
+        if frame is None:
+            return
+        with self._lock:
+            if len(self._free) < self.size:
+                self._free.append(frame)
+
+
+class FramePipeline:
+    """Chia vòng lặp nhận diện thành 3 tầng: chụp ảnh -> suy luận -> hiển thị.
+
+    - capture: luồng riêng, liên tục đọc camera và ghi đè LatestFrameSlot
+    - process(frame): luồng riêng, chỉ xử lý khung mới nhất, trả về kết quả cho tầng hiển thị
+    - render(result): chạy trên luồng gọi run() với tốc độ render_fps, trả về False để dừng;
+      result là None khi chưa có kết quả mới (chỉ cần bơm sự kiện cửa sổ)
+
+    Khung hình đi qua cả ba tầng mà không sao chép; tầng hiển thị vẽ xong thì khung
+    trở về FramePool để camera ghi đè ở lần đọc sau.
+    """
+
+    def __init__(self, video, process, render, render_fps=30, queue_size=2, stats=None, interval=None,
+                 pool=None):
+        self.video = video
+        # interval(): khoảng nghỉ tối thiểu giữa hai lần suy luận (giây), ví dụ ở chế độ chờ
+        self.interval = interval
+        self.stats = stats or Instrumentation(enabled=False)
+        self.process = process
+        self.render = render
+        self.render_interval = 1.0 / render_fps
+        self.frames = LatestFrameSlot()
+        self.results = queue.Queue(maxsize=queue_size)
+        # Đủ cho: camera đang ghi + ô chờ + đang suy luận + hàng đợi kết quả + đang hiển thị
+        self.pool = pool or FramePool(queue_size + 4)
+        self.stop_event = threading.Event()
+        self._threads = []
+
+    def _capture_loop(self):
+        stats = self.stats
+        pool = self.pool
+        while not self.stop_event.is_set():
+            t = stats.mark()
+            buffer = pool.acquire()
+            ret, frame = self.video.read(buffer) if buffer is not None else self.video.read()
+            stats.record("capture", t)
+            if not ret:
+                pool.release(buffer)
+                time.sleep(0.005)
+                continue
+            if frame is not buffer:
+                pool.allocations += 1
+                stats.count("frame_allocs")
+            pool.release(self.frames.put(frame))
+
+    def _inference_loop(self):
+        reported_dropped = 0
+        while not self.stop_event.is_set():
+            frame = self.frames.get(timeout=0.1)
+            if frame is None:
+                continue
+            started = time.monotonic()
+            for old_frame, _ in put_latest(self.results, (frame, self.process(frame))):
+                self.pool.release(old_frame)
+            self.stats.frame_done()
+            dropped = self.frames.dropped
+            if dropped != reported_dropped:
+                self.stats.count("dropped_frames", dropped - reported_dropped)
+                reported_dropped = dropped
+            if self.interval is not None:
+                delay = self.interval() - (time.monotonic() - started)
+                if delay > 0:
+                    self.stop_event.wait(delay)
+
+    def start(self):
+        self.stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout=1.0):
+        self.stop_event.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def run(self):
+        """Chạy tầng hiển thị trên luồng hiện tại cho tới khi render trả về False."""
+        self.start()
+        try:
+            while not self.stop_event.is_set():
+                next_tick = time.monotonic() + self.render_interval
+                try:
+                    frame, result = self.results.get(timeout=self.render_interval)
+                except queue.Empty:
+                    frame, result = None, None
+                keep_running = self.render(result)
+                self.pool.release(frame)
+                if keep_running is False:
+                    break
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        finally:
+            self.stop()
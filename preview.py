@@ -0,0 +1,103 @@
+import time
+import tkinter as tk
+
+from pipeline import LatestFrameSlot
+
+
+class FramePreview:
+    """Hiển thị khung hình camera trong một Canvas của Tk.
+
+    - submit(frame): gọi từ luồng hiển thị của pipeline, tự giới hạn ở preview_fps,
+      thu nhỏ + đổi BGR->RGB vào vài bộ đệm dùng lại (chỉ cấp phát lại khi kích thước widget đổi)
+    - Luồng Tk lấy khung mới nhất theo chu kỳ riêng và paste vào một PhotoImage duy nhất
+    - Cửa sổ bị thu nhỏ (iconify) thì dừng hẳn cả xử lý lẫn vẽ
+    """
+
+    def __init__(self, root, parent, preview_fps=15, bg="#000000", buffers=3):
+        self.root = root
+        self.interval = 1.0 / preview_fps
+        self.canvas = tk.Canvas(parent, bg=bg, highlightthickness=0)
+        self.frames = LatestFrameSlot()
+        self.active = True
+        self.size = None  # (w, h) vùng canvas, cập nhật bởi <Configure>
+        self._buffers = [None] * buffers
+        self._buffer_index = 0
+        self._resized = None
+        self._target = None  # (w, h) kích thước ảnh thu nhỏ, tính lại khi size/khung đổi
+        self._source_shape = None
+        self._last_submit = 0.0
+        self._photo = None
+        self._photo_size = None
+        self._image_item = None
+        self._timer = None
+        self.canvas.bind("<Configure>", self.on_configure)
+        root.bind("<Unmap>", self.on_unmap, add="+")
+        root.bind("<Map>", self.on_map, add="+")
+        self.schedule()
+
+    # --- Luồng hiển thị của pipeline ---
+    def submit(self, frame):
+        if not self.active or self.size is None:
+            return
+        now = time.monotonic()
+        if now - self._last_submit < self.interval:
+            return
+        self._last_submit = now
+        import cv2
+        size = self.size
+        if self._target is None or self._source_shape != frame.shape[:2] or self._target[2] != size:
+            h, w = frame.shape[:2]
+            scale = min(size[0] / w, size[1] / h)
+            tw, th = max(1, int(w * scale)), max(1, int(h * scale))
+            self._target = (tw, th, size)
+            self._source_shape = frame.shape[:2]
+            self._buffers = [None] * len(self._buffers)
+            self._resized = None
+        tw, th = self._target[:2]
+        i = self._buffer_index
+        self._buffer_index = (i + 1) % len(self._buffers)
+        self._resized = cv2.resize(frame, (tw, th), dst=self._resized, interpolation=cv2.INTER_AREA)
+        self._buffers[i] = cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._buffers[i])
+        self.frames.put(self._buffers[i])
+
+    # --- Luồng Tk ---
+    def on_configure(self, event):
+        self.size = (max(1, event.width), max(1, event.height))
+
+    def on_unmap(self, event):
+        if event.widget is self.root:
+            self.active = False
+            if self._timer is not None:
+                self.root.after_cancel(self._timer)
+                self._timer = None
+
+    def on_map(self, event):
+        if event.widget is self.root and not self.active:
+            self.active = True
+            self.schedule()
+
+    def schedule(self):
+        self._timer = self.root.after(int(self.interval * 1000), self.tick)
+
+    def tick(self):
+        self._timer = None
+        if not self.active:
+            return
+        frame = self.frames.get(timeout=0)
+        if frame is not None:
+            self.show(frame)
+        self.schedule()
+
+    def show(self, frame):
+        from PIL import Image, ImageTk
+        h, w = frame.shape[:2]
+        if self._photo is None or self._photo_size != (w, h):
+            self._photo = ImageTk.PhotoImage("RGB", (w, h))
+            self._photo_size = (w, h)
+            if self._image_item is None:
+                self._image_item = self.canvas.create_image(0, 0, image=self._photo)
+            else:
+                self.canvas.itemconfig(self._image_item, image=self._photo)
+        if self.size is not None:
+            self.canvas.coords(self._image_item, self.size[0] // 2, self.size[1] // 2)
+        self._photo.paste(Image.fromarray(frame))
@@ -0,0 +1,53 @@
+import socket
+from types import SimpleNamespace
+
+import pytest
+
+from api import ControlServer, HttpError
+from device_state import TOGGLE, DeviceStateBus
+from devices import DEFAULT_DEVICES, DeviceRegistry
+
+
+def make_server():
+    registry = DeviceRegistry(DEFAULT_DEVICES)
+    app = SimpleNamespace(registry=registry, device_bus=DeviceStateBus(), state_listeners=[],
+                          get_device_states=lambda: {d.id: False for d in registry})
+    return app, ControlServer(app, port=0)
+
+
+def test_toggle_is_published_as_intent():
+    app, server = make_server()
+    assert server.command({"device": "led", "state": "toggle"}) == TOGGLE
+    assert app.device_bus.drain()[0] == {"led": TOGGLE}
+    # Hai lệnh toggle trước khi luồng Tk kịp áp dụng triệt tiêu nhau thay vì cùng thành True
+    server.command({"device": "led", "state": "toggle"})
+    server.command({"device": "led", "state": "toggle"})
+    assert app.device_bus.drain()[0] == {}
+
+
+@pytest.mark.parametrize("data", [{"device": ["led"], "state": True}, {"device": None, "state": True},
+                                  {"device": "led", "state": "maybe"}, ["led"]])
+def test_invalid_command_is_rejected(data):
+    _, server = make_server()
+    with pytest.raises(HttpError) as e:
+        server.command(data)
+    assert e.value.status in (400, 404)
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_state_change_after_server_died_is_ignored():
+    busy = socket.socket()
+    busy.bind(("127.0.0.1", 0))
+    busy.listen()
+    try:
+        app, server = make_server()
+        server.port = busy.getsockname()[1]
+        # Cổng đã bị chiếm: luồng server chết, loop của nó đã đóng
+        server.start()
+        server.join(2.0)
+        assert not server.is_alive()
+        assert server.loop is not None and server.loop.is_closed()
+        for listener in app.state_listeners:
+            listener("led", True, "manual")
+    finally:
+        busy.close()
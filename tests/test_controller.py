@@ -0,0 +1,151 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from controller import (ACK_START, DeviceDispatcher, FakeArduino, MockTransport, decode_frame,
+                        encode_frame, read_frame)
+
+needs_pty = pytest.mark.skipif(sys.platform == "win32", reason="FakeArduino cần pty")
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_frame_round_trip():
+    changes = [(1, True), (4, False), (255, True)]
+    frame = encode_frame(300, changes)
+    assert decode_frame(frame) == (300 & 0xFF, changes)
+    data = iter(frame)
+    assert read_frame(lambda n: bytes(next(data) for _ in range(n))) == (300 & 0xFF, changes)
+
+
+def test_corrupted_frame_is_rejected():
+    frame = bytearray(encode_frame(7, [(2, True)]))
+    frame[3] ^= 0xFF
+    assert decode_frame(bytes(frame)) is None
+    assert decode_frame(b"\xaa\x01") is None
+
+
+@pytest.mark.parametrize("changes", [[(0, True)], [(256, True)], [("led", True)], [(1, True)] * 256])
+def test_encode_rejects_out_of_range(changes):
+    with pytest.raises(ValueError):
+        encode_frame(1, changes)
+
+
+@needs_pty
+def test_dispatcher_retries_dropped_acks():
+    arduino = FakeArduino(drop_every=2)
+    dispatcher = DeviceDispatcher(arduino.transport(), ack_timeout=0.05, retries=3)
+    try:
+        for device in ["led", "tv", "fan", "stove", "ac"]:
+            dispatcher.send(device, True)
+            assert wait_for(lambda: dispatcher.sent_states.get(device) is True)
+        assert arduino.states == {"led": True, "tv": True, "fan": True, "stove": True, "ac": True}
+        assert dispatcher.stats["retries"] >= 2
+        assert dispatcher.stats["failures"] == 0
+    finally:
+        dispatcher.close()
+        arduino.close()
+
+
+@needs_pty
+def test_dispatcher_requeues_after_failure():
+    arduino = FakeArduino(drop_every=1)
+    dispatcher = DeviceDispatcher(arduino.transport(), ack_timeout=0.02, retries=1, retry_delay=0.05)
+    try:
+        dispatcher.send("led", True)
+        assert wait_for(lambda: dispatcher.stats["failures"] >= 1)
+        assert "led" not in dispatcher.sent_states
+        # Thiết bị hoạt động lại: lệnh đã thất bại được gửi lại mà không cần send() mới
+        arduino.drop_every = 0
+        assert wait_for(lambda: dispatcher.sent_states.get("led") is True)
+        assert arduino.states["led"] is True
+    finally:
+        dispatcher.close()
+        arduino.close()
+
+
+def test_newer_command_wins_over_requeued_one():
+    dispatcher = DeviceDispatcher(MockTransport())
+    dispatcher.close()
+    dispatcher._pending = {"led": False}
+    dispatcher._requeue({"led": True, "tv": True})
+    assert dispatcher._pending == {"led": False, "tv": True}
+
+
+class FlakyTransport(MockTransport):
+    """Lần ghi đầu ném lỗi không phải OSError."""
+
+    def __init__(self):
+        super().__init__(handlers={})
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        if self.writes == 1:
+            raise RuntimeError("transport lỗi")
+        super().write(data)
+
+
+def test_unexpected_exception_does_not_kill_dispatcher():
+    dispatcher = DeviceDispatcher(FlakyTransport(), retry_delay=0.05)
+    try:
+        dispatcher.send("tv", True)
+        assert wait_for(lambda: dispatcher.sent_states.get("tv") is True)
+        assert dispatcher.stats["failures"] == 1
+        dispatcher.send("led", True)
+        assert wait_for(lambda: dispatcher.sent_states.get("led") is True)
+    finally:
+        dispatcher.close()
+
+
+def test_broken_mock_hook_does_not_block_other_devices():
+    def broken(state):
+        raise RuntimeError("hook lỗi")
+
+    dispatcher = DeviceDispatcher(MockTransport(handlers={"tv": broken}))
+    try:
+        dispatcher.send("tv", True)
+        dispatcher.send("led", True)
+        assert wait_for(lambda: dispatcher.sent_states.get("led") is True)
+    finally:
+        dispatcher.close()
+
+
+class LateAckTransport(MockTransport):
+    """Ack của khung đầu tiên đến trễ hơn ack_timeout."""
+
+    def __init__(self, delay):
+        super().__init__(handlers={})
+        self.delay = delay
+        self.frames = 0
+
+    def write(self, data):
+        self.frames += 1
+        if self.frames > 1:
+            return super().write(data)
+        seq = decode_frame(data)[0]
+        threading.Timer(self.delay, self._acks.put, [bytes([ACK_START, seq, 0])]).start()
+
+
+def test_late_ack_does_not_desync_later_frames():
+    dispatcher = DeviceDispatcher(LateAckTransport(0.08), ack_timeout=0.05, retries=3)
+    try:
+        dispatcher.send("led", True)
+        assert wait_for(lambda: dispatcher.sent_states.get("led") is True)
+        retries = dispatcher.stats["retries"]
+        for device in ["tv", "fan", "stove", "ac"]:
+            dispatcher.send(device, True)
+            assert wait_for(lambda: dispatcher.sent_states.get(device) is True)
+        assert dispatcher.stats["retries"] == retries
+        assert dispatcher.stats["failures"] == 0
+    finally:
+        dispatcher.close()
@@ -0,0 +1,42 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from frontend import AdaptiveFrontEnd  # noqa: E402
+
+DARK = np.zeros((48, 64, 3), dtype=np.uint8)
+BRIGHT = np.full((48, 64, 3), 200, dtype=np.uint8)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run(frontend, clock, frames, step=0.5):
+    for frame in frames:
+        clock.now += step
+        frontend.prepare(frame)
+        frontend.update(None, frame.shape)
+
+
+def test_continuous_motion_without_hand_keeps_full_rate():
+    clock = FakeClock()
+    frontend = AdaptiveFrontEnd(idle_after=10.0, idle_fps=2.0, clock=clock)
+    run(frontend, clock, [DARK, BRIGHT] * 20)
+    assert not frontend.idle
+    assert frontend.frame_interval() == 0.0
+
+
+def test_idle_after_no_motion_and_no_hand_then_ramps_up_on_motion():
+    clock = FakeClock()
+    frontend = AdaptiveFrontEnd(idle_after=10.0, idle_fps=2.0, clock=clock)
+    run(frontend, clock, [DARK] * 40)
+    assert frontend.idle
+    assert frontend.frame_interval() == 0.5
+    run(frontend, clock, [BRIGHT])
+    assert frontend.frame_interval() == 0.0
@@ -0,0 +1,58 @@
+import pytest
+
+from gesture import GestureDebouncer, stabilize
+
+FPS = 30.0
+
+
+def values(events):
+    return [value for _, value in events]
+
+
+def test_single_frame_flicker_is_ignored():
+    counts = [2] * 10 + [3] + [2] * 10 + [5] + [2] * 10
+    assert values(stabilize(counts)) == [2]
+
+
+def test_alternating_noise_never_commits():
+    assert stabilize([1, 2] * 30) == []
+
+
+def test_noisy_transition_commits_once_per_change():
+    counts = [1] * 15 + [1, 3, 1, 3] + [3] * 20 + [None, 3] + [3] * 10
+    assert values(stabilize(counts)) == [1, 3]
+
+
+def test_commit_waits_for_min_frames_and_dwell():
+    debouncer = GestureDebouncer(min_frames=4, min_dwell=0.15, cooldown=0.0)
+    (index, value), = stabilize([2] * 10, debouncer, FPS)
+    assert value == 2
+    assert index >= 3 and index / FPS >= 0.15
+    assert (index - 1) / FPS < 0.15
+
+
+def test_cooldown_delays_next_commit():
+    debouncer = GestureDebouncer(min_frames=4, min_dwell=0.1, cooldown=1.0)
+    counts = [2] * 10 + [4] * 40
+    first, second = stabilize(counts, debouncer, FPS)
+    assert values([first, second]) == [2, 4]
+    gap = (second[0] - first[0]) / FPS
+    # 4 đã ổn định từ lâu, chỉ còn chờ hết cooldown: chốt ngay ở khung đầu tiên sau đó
+    assert 1.0 <= gap < 1.0 + 1.5 / FPS
+
+
+def test_same_value_is_not_recommitted():
+    counts = [4] * 20 + [None] * 2 + [4] * 20
+    assert values(stabilize(counts)) == [4]
+
+
+def test_debouncing_cuts_commands_per_minute():
+    # 10 giây đếm ngón nhiễu quanh giá trị 2, thỉnh thoảng chuyển hẳn sang 3
+    counts = ([2] * 8 + [3] + [2] * 6 + [1]) * 10 + [3] * 60 + ([3] * 5 + [2]) * 20
+    raw_changes = sum(a != b for a, b in zip(counts, counts[1:]))
+    debouncer = GestureDebouncer()
+    assert values(stabilize(counts, debouncer, FPS)) == [2, 3]
+    elapsed = len(counts) / FPS
+    assert debouncer.commands_per_minute(elapsed) == pytest.approx(2 * 60.0 / elapsed)
+    assert debouncer.commands_per_minute(elapsed) < raw_changes * 60.0 / elapsed / 10
+    assert debouncer.commands_per_minute(0.0) == 0.0
@@ -0,0 +1,39 @@
+import pytest
+
+from journal import DeviceJournal, query_journal
+
+
+def test_failed_flush_keeps_batch_and_caps_buffer(tmp_path):
+    # Một file nằm đúng chỗ thư mục nhật ký: open_segment lỗi cho tới khi file bị xóa
+    directory = tmp_path / "journal"
+    directory.write_text("")
+    journal = DeviceJournal(str(directory), max_buffer=5)
+    for i in range(3):
+        journal.gesture(i)
+    with pytest.raises(OSError):
+        journal.flush()
+    for i in range(3, 8):
+        journal.gesture(i)
+    assert [r["gesture"] for r in journal._buffer] == [3, 4, 5, 6, 7]
+    assert journal.dropped == 3
+    directory.unlink()
+    journal.flush()
+    journal.close_segment()
+    assert [r["gesture"] for r in query_journal(str(directory))] == [3, 4, 5, 6, 7]
+
+
+def test_writer_thread_survives_flush_errors(tmp_path):
+    directory = tmp_path / "journal"
+    directory.write_text("")
+    journal = DeviceJournal(str(directory), flush_interval=0.01)
+    journal.start()
+    try:
+        journal.device("led", False, True, "manual")
+        journal.stop_event.wait(0.1)
+        assert journal.is_alive()
+        directory.unlink()
+        journal.device("tv", False, True, "manual")
+    finally:
+        journal.stop()
+    assert not journal.is_alive()
+    assert [r["device"] for r in query_journal(str(directory))] == ["led", "tv"]
@@ -0,0 +1,75 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from devices import DEFAULT_DEVICES, DeviceRegistry  # noqa: E402
+from landmark_trace import TraceRecorder, count_trace, load_trace, replay  # noqa: E402
+from landmarks import JOINT_IDS, NUM_LANDMARKS, TIP_IDS  # noqa: E402
+
+FPS = 30.0
+
+
+def hand(extended):
+    """Một bàn tay (1, 21, 3) với `extended` ngón đầu tiên duỗi (tay phải, không lật)."""
+    lm = np.full((1, NUM_LANDMARKS, 3), 0.5, dtype=np.float32)
+    for finger, (tip, joint) in enumerate(zip(TIP_IDS, JOINT_IDS)):
+        up = finger < extended
+        if finger == 0:
+            lm[0, tip, 0] = 0.6 if up else 0.4
+        else:
+            lm[0, tip, 1] = 0.2 if up else 0.8
+    return lm
+
+
+def record(path, sequence, aspect=4 / 3):
+    recorder = TraceRecorder(str(path), start_time=100.0, aspect=aspect)
+    for i, extended in enumerate(sequence):
+        lm = None if extended is None else hand(extended)
+        recorder.record(lm, timestamp=100.0 + i / FPS)
+    recorder.close()
+
+
+def test_round_trip_preserves_header_and_records(tmp_path):
+    path = tmp_path / "session.lmtrace"
+    sequence = [None] * 3 + [2] * 5 + [5] * 4
+    record(path, sequence)
+    header, records = load_trace(str(path))
+    assert header["max_hands"] == 2
+    assert header["start_time"] == 100.0
+    assert header["aspect"] == pytest.approx(4 / 3)
+    assert len(records) == len(sequence)
+    assert records["n"].tolist() == [0.0 if e is None else 1.0 for e in sequence]
+    np.testing.assert_allclose(records["t"], np.arange(len(sequence)) / FPS, atol=1e-5)
+    np.testing.assert_array_equal(records["lm"][5, 0], hand(2)[0])
+    totals, has_hand = count_trace(records)
+    assert has_hand.tolist() == [e is not None for e in sequence]
+    assert totals[has_hand].tolist() == [e for e in sequence if e is not None]
+
+
+def test_replay_matches_live_control_path(tmp_path):
+    path = tmp_path / "session.lmtrace"
+    # Nhiễu một khung ở giữa không được tạo lần chốt mới
+    sequence = [None] * 5 + [2] * 20 + [4] + [2] * 5 + [3] * 25 + [None] * 5
+    record(path, sequence)
+    _, records = load_trace(str(path))
+    registry = DeviceRegistry(DEFAULT_DEVICES)
+    events = replay(records, registry=registry)
+    assert [total for _, total, _ in events] == [2, 3]
+    assert events[0][2] == registry.states_for_fingers(2)
+    assert events[1][2] == registry.states_for_fingers(3)
+    assert events[0][0] < events[1][0]
+
+
+def test_empty_trace(tmp_path):
+    path = tmp_path / "empty.lmtrace"
+    record(path, [])
+    header, records = load_trace(str(path))
+    assert len(records) == 0
+    assert replay(records, registry=DeviceRegistry(DEFAULT_DEVICES)) == []
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / "not_a_trace"
+    path.write_bytes(b"\0" * 128)
+    with pytest.raises(ValueError):
+        load_trace(str(path))
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from landmarks import JOINT_IDS, NUM_LANDMARKS, TIP_IDS, count_fingers  # noqa: E402
+
+
+def mp_hand(thumb_dx, fingers_up):
+    """Stub bàn tay mediapipe: ngón cái lệch thumb_dx theo x so với khớp IP, fingers_up ngón khác duỗi."""
+    points = [[0.5, 0.5, 0.0] for _ in range(NUM_LANDMARKS)]
+    points[TIP_IDS[0]][0] = 0.5 + thumb_dx
+    for finger in range(1, 5):
+        points[TIP_IDS[finger]][1] = 0.2 if finger <= fingers_up else 0.8
+    assert all(points[j] == [0.5, 0.5, 0.0] for j in JOINT_IDS)
+    return SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=z) for x, y, z in points])
+
+
+def handedness(*labels):
+    return [SimpleNamespace(classification=[SimpleNamespace(label=label)]) for label in labels]
+
+
+def test_user_right_hand_labelled_left():
+    # Tay phải thật trên khung không lật: nhãn "Left", ngón cái duỗi có tip.x > IP.x
+    _, counts, total = count_fingers([mp_hand(0.1, 1), mp_hand(-0.1, 1)], handedness("Left", "Left"))
+    assert counts.tolist() == [2, 1]
+    assert total == 3
+
+
+def test_user_left_hand_labelled_right():
+    _, counts, total = count_fingers([mp_hand(-0.1, 1), mp_hand(0.1, 1)], handedness("Right", "Right"))
+    assert counts.tolist() == [2, 1]
+    assert total == 3
+
+
+def test_one_index_finger_per_label():
+    # Ngón cái gập vào lòng bàn tay (về phía ngón út) + một ngón trỏ: 1 ngón với cả hai tay
+    right = mp_hand(-0.1, 1)
+    left = mp_hand(0.1, 1)
+    _, counts, total = count_fingers([right, left], handedness("Left", "Right"))
+    assert counts.tolist() == [1, 1]
+    assert total == 2
+
+
+def test_missing_handedness_defaults_to_left_label():
+    _, counts, _ = count_fingers([mp_hand(0.1, 0)])
+    assert counts.tolist() == [1]
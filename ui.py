@@ -1,74 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
+import hashlib
 import os
-import json
-import time
-import uuid
-
-# --- License Config ---
-LICENSE_FILE = "license.json"
-LICENSE_TIERS = {
-    "Trial": 30 * 86400,
-    "Basic": 90 * 86400,
-    "Standard": 180 * 86400,
-    "Pro": 270 * 86400,
-    "Premium": 365 * 86400,
-    "VIP Vinh Vien": None,  # Lifetime
-    "test": 3600  # Test key: 1 hour
-}
-
-def get_machine_code():
-    mac = uuid.getnode()
-    mac_str = ':'.join(['{:02X}'.format((mac >> ele) & 0xff)
-                        for ele in range(40, -1, -8)])
-    return mac_str
-
-def is_license_valid():
-    if not os.path.exists(LICENSE_FILE):
-        return False
-    with open(LICENSE_FILE, "r") as file:
-        license_info = json.load(file)
-    license_type = license_info.get("license_type")
-    registered_time = license_info.get("registered_time")
-    if license_type not in LICENSE_TIERS:
-        return False
-    if LICENSE_TIERS[license_type] is None:
-        return True  # Lifetime
-    now = int(time.time())
-    expiration = registered_time + LICENSE_TIERS[license_type]
-    return now < expiration
-
-def remaining_days():
-    if not os.path.exists(LICENSE_FILE):
-        return 0
-    with open(LICENSE_FILE, "r") as file:
-        license_info = json.load(file)
-    license_type = license_info.get("license_type")
-    if license_type not in LICENSE_TIERS:
-        return 0
-    if LICENSE_TIERS[license_type] is None:
-        return "∞"
-    now = int(time.time())
-    expiration = license_info.get("registered_time") + LICENSE_TIERS[license_type]
-    remaining_sec = expiration - now
-    if license_type == "test":
-        hours_left = remaining_sec // 3600
-        minutes_left = (remaining_sec % 3600) // 60
-        if hours_left < 0:
-            return 0
-        return f"{hours_left}h {minutes_left}m"
-    remaining = remaining_sec // 86400
-    return max(0, remaining)
-
-def save_license(license_type):
-    data = {
-        "license_type": license_type,
-        "registered_time": int(time.time()),
-        "machine_code": get_machine_code()
-    }
-    with open(LICENSE_FILE, "w") as f:
-        json.dump(data, f)
+import threading
+from device_state import TOGGLE, DeviceStateBus
+from devices import DeviceStateStore, load_registry
+from licensing import LICENSE_TIERS, LicenseService, get_machine_code
+from preview import FramePreview
 
 COMPANY_NAME = "CÔNG TY TNHH TRUYỀN THÔNG CÔNG NGHỆ, DU LỊCH VÀ GIÁO DỤC HOÀNG HẢI (HCTTE CO., LTD)"
 COMPANY_ADDRESS = "Địa chỉ: 14-15A, Tầng 7, Tòa nhà Charmvit Tower, 117 Trần Duy Hưng, Trung Hòa, Cầu Giấy, Hà Nội"
@@ -99,20 +37,125 @@ class ToggleSwitch(tk.Frame):
             self.canvas.itemconfig(self.rect, fill="#CCCCCC")
             self.canvas.coords(self.circle, 2, 2, 18, 18)
 
+# Ảnh icon/logo đã resize được lưu sẵn ở đây, tạo lại khi file gốc mới hơn
+THUMBNAIL_CACHE_DIR = os.path.join(".cache", "thumbnails")
+
+def thumbnail_path(file_path, size):
+    # Icon cùng tên ở các thư mục khác nhau phải có file cache riêng: khóa gồm cả hash đường dẫn đầy đủ
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(THUMBNAIL_CACHE_DIR, f"{name}_{digest}_{size[0]}x{size[1]}.png")
+
 def load_image(file_path, size=(40, 40)):
     try:
         if os.path.exists(file_path):
+            cached = thumbnail_path(file_path, size)
+            if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(file_path):
+                # Tk đọc PNG trực tiếp, không cần Pillow
+                return tk.PhotoImage(file=cached)
+            from PIL import Image  # chỉ cần khi cache chưa có hoặc đã cũ
             img = Image.open(file_path).resize(size, Image.LANCZOS)
-            return ImageTk.PhotoImage(img)
+            os.makedirs(THUMBNAIL_CACHE_DIR, exist_ok=True)
+            img.save(cached, "PNG")
+            return tk.PhotoImage(file=cached)
         else:
             return None
     except Exception as e:
         print(f"Error loading image {file_path}: {e}")
         return None
 
+class DeviceListView(tk.Frame):
+    """Danh sách thiết bị cuộn được: chỉ có visible_rows hàng widget, được gán lại thiết bị khi cuộn."""
+
+    def __init__(self, parent, registry, store, icons, on_toggle, theme, visible_rows=5):
+        super().__init__(parent, bg=theme["frame_bg"])
+        self.registry = registry
+        self.store = store
+        self.icons = icons
+        self.on_toggle = on_toggle
+        self.theme = theme
+        self.first = 0
+        self.visible_rows = min(visible_rows, len(registry))
+        self.rows_frame = tk.Frame(self, bg=theme["frame_bg"])
+        self.rows_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        if len(registry) > self.visible_rows:
+            self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scroll)
+            self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        else:
+            self.scrollbar = None
+        self.rows = [self.create_row() for _ in range(self.visible_rows)]
+        self.render()
+
+    def create_row(self):
+        frame = tk.Frame(self.rows_frame, bg=self.theme["frame_bg"])
+        frame.pack(fill=tk.X, pady=5)
+        row = {"frame": frame, "index": None}
+        row["icon"] = tk.Label(frame, bg=self.theme["frame_bg"])
+        row["icon"].pack(side=tk.LEFT, padx=5)
+        row["label"] = tk.Label(frame, text="", font=("Helvetica", 12, "bold"), bg=self.theme["frame_bg"], fg=self.theme["frame_fg"])
+        row["label"].pack(side=tk.LEFT, padx=5)
+        row["toggle"] = ToggleSwitch(frame, lambda state, r=row: self.on_toggle(r["index"], state), bg=self.theme["canvas_bg"])
+        row["toggle"].pack(side=tk.LEFT, padx=5)
+        for widget in (frame, row["icon"], row["label"], row["toggle"].canvas):
+            widget.bind("<MouseWheel>", self.on_mousewheel)
+            widget.bind("<Button-4>", lambda e: self.scroll_to(self.first - 1))
+            widget.bind("<Button-5>", lambda e: self.scroll_to(self.first + 1))
+        return row
+
+    def render(self):
+        for k, row in enumerate(self.rows):
+            i = self.first + k
+            device = self.registry[i]
+            row["index"] = i
+            icon = self.icons.get(device.icon)
+            row["icon"].configure(image=icon if icon else "", width=40 if icon else 0)
+            row["label"].configure(text=device.label)
+            row["toggle"].set_state(self.store.get(i))
+        if self.scrollbar is not None:
+            n = len(self.registry)
+            self.scrollbar.set(self.first / n, (self.first + self.visible_rows) / n)
+
+    def refresh(self, indices):
+        """Chỉ cập nhật các hàng đang hiển thị có thiết bị vừa đổi trạng thái."""
+        for i in indices:
+            k = i - self.first
+            if 0 <= k < self.visible_rows:
+                self.rows[k]["toggle"].set_state(self.store.get(i))
+
+    def scroll_to(self, first):
+        first = max(0, min(first, len(self.registry) - self.visible_rows))
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def on_scroll(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(round(float(value) * len(self.registry))))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll_to(self.first + int(value) * step)
+
+    def on_mousewheel(self, event):
+        self.scroll_to(self.first - (1 if event.delta > 0 else -1))
+
 class SmartHomeApp:
-    def __init__(self, root, username="Quý khách", role="Khách hàng"):
+    def __init__(self, root, username="Quý khách", role="Khách hàng", dispatcher=None, registry=None, license_service=None, preview_fps=15, journal=None):
         self.root = root
+        self.preview_fps = preview_fps
+        # Được set khi cửa sổ chính đóng, để luồng nhận diện tự dừng
+        self.closing = threading.Event()
+        # License được đọc một lần và giữ trong bộ nhớ; luồng nhận diện cũng hỏi qua đây
+        self.license = license_service or LicenseService()
+        self._license_timer = None
+        # Danh sách thiết bị (devices.json nếu có) và mảng trạng thái tương ứng
+        self.registry = registry or load_registry()
+        self.store = DeviceStateStore(len(self.registry))
+        # controller.DeviceDispatcher: gửi lệnh tới thiết bị thật trên luồng nền
+        self.dispatcher = dispatcher
+        # journal.DeviceJournal: nhật ký mọi lần đổi trạng thái (ghi đĩa trên luồng nền)
+        self.journal = journal
+        # callback(device_id, state, source) gọi trên luồng Tk sau mỗi lần đổi trạng thái (vd. api.ControlServer)
+        self.state_listeners = []
         self.username = username
         self.role = role
         self.root.title("Hệ Thống Điều Khiển Ngôi Nhà Thông Minh Bằng AI")
@@ -126,28 +169,25 @@ class SmartHomeApp:
         }
         self.current_theme = self.light_theme
         self.root.configure(bg=self.current_theme["bg"])
-        # Device states
-        self.led_status = "OFF"
-        self.fan_status = "OFF"
-        self.ac_status = "OFF"
-        self.tv_status = "OFF"
-        self.stove_status = "OFF"
-        # Load icons
-        self.icons = {
-            "led": load_image("image/light.png", size=(40,40)),
-            "fan": load_image("image/fan.png", size=(40,40)),
-            "ac": load_image("image/ac.png", size=(40,40)),
-            "tv": load_image("image/tv.png", size=(40,40)),
-            "stove": load_image("image/stove.png", size=(40,40)),
-        }
+        # Load icons (mỗi file chỉ load một lần)
+        self.icons = {}
+        for device in self.registry:
+            if device.icon and device.icon not in self.icons:
+                self.icons[device.icon] = load_image(device.icon, size=(40,40))
         self.license_label = None
         self.license_frame = None
         self.license_entry = None
         self.license_machine_label = None
         self.license_msg_label = None
+        # Trạng thái mong muốn do luồng nhận diện đẩy vào, được áp dụng trên luồng Tk
+        self.device_bus = DeviceStateBus()
+        self.device_pump_ms = 50
         self.setup_ui()
-        self.update_license_label_periodically()
+        self.update_license_label()
+        self.watch_license_file()
+        self.pump_device_states()
         self.root.bind("<Delete>", lambda e: self.root.destroy())
+        self.root.bind("<Destroy>", self.on_destroy, add="+")
 
     def setup_ui(self):
         self.setup_header()
@@ -203,7 +243,7 @@ class SmartHomeApp:
     def activate_license(self):
         key = self.license_entry.get()
         if key in LICENSE_TIERS:
-            save_license(key)
+            self.license.save(key)
             self.update_license_label()
             self.license_msg_label.config(text=f"Kích hoạt thành công gói: {key}", fg="green")
             self.license_frame.pack_forget()
@@ -211,23 +251,33 @@ class SmartHomeApp:
             self.license_msg_label.config(text="Mã không hợp lệ!", fg="red")
 
     def update_license_label(self):
-        if os.path.exists(LICENSE_FILE):
-            days = remaining_days()
-            if days == "∞":
-                text = "Thời hạn còn lại: Vĩnh viễn"
-            elif isinstance(days, str) and "h" in days:
-                text = f"Thời hạn còn lại: {days}"
-            else:
-                text = f"Thời hạn còn lại: {days} ngày"
+        if self.license.exists:
+            text = self.license.label_text()
         else:
-            save_license("Trial")
+            self.license.save("Trial")
             text = "Bắt đầu dùng thử: 30 ngày"
         if self.license_label:
             self.license_label.config(text=text)
+        self.schedule_license_boundary()
+
+    def schedule_license_boundary(self):
+        # Hẹn giờ đúng lúc nhãn thời hạn đổi (phút/ngày tiếp theo) thay vì cập nhật mỗi giây
+        if self._license_timer is not None:
+            self.root.after_cancel(self._license_timer)
+            self._license_timer = None
+        delay = self.license.next_boundary_delay()
+        if delay is not None:
+            self._license_timer = self.root.after(int(delay * 1000) + 50, self.on_license_boundary)
 
-    def update_license_label_periodically(self):
+    def on_license_boundary(self):
+        self._license_timer = None
         self.update_license_label()
-        self.root.after(1000, self.update_license_label_periodically)
+
+    def watch_license_file(self, interval_ms=5000):
+        # Chỉ stat() file để phát hiện sửa đổi từ bên ngoài
+        if self.license.check_for_changes():
+            self.update_license_label()
+        self.root.after(interval_ms, self.watch_license_file)
 
     def setup_main_frame(self):
         self.main_frame = tk.Frame(self.root, bg=self.current_theme["bg"])
@@ -266,82 +316,62 @@ class SmartHomeApp:
         self.slogan_label.pack()
         self.dashboard_frame = tk.Frame(self.right_pane, bg=self.current_theme["frame_bg"], bd=2, relief=tk.GROOVE, padx=20, pady=10)
         self.dashboard_frame.pack(fill=tk.X, pady=5)
-        self.dashboard_frame.grid_columnconfigure((0, 1, 2, 3, 4), weight=1)
-        self.led_status_label = tk.Label(self.dashboard_frame, text=f"LED: {self.led_status}", font=("Helvetica", 11), fg=self.current_theme["frame_fg"], bg=self.current_theme["frame_bg"])
-        self.led_status_label.grid(row=0, column=0, padx=15, pady=8, sticky='w')
-        self.fan_status_label = tk.Label(self.dashboard_frame, text=f"Quạt: {self.fan_status}", font=("Helvetica", 11), fg=self.current_theme["frame_fg"], bg=self.current_theme["frame_bg"])
-        self.fan_status_label.grid(row=0, column=1, padx=15, pady=8, sticky='w')
-        self.ac_status_label = tk.Label(self.dashboard_frame, text=f"Điều hòa: {self.ac_status}", font=("Helvetica", 11), fg=self.current_theme["frame_fg"], bg=self.current_theme["frame_bg"])
-        self.ac_status_label.grid(row=0, column=2, padx=15, pady=8, sticky='w')
-        self.tv_status_label = tk.Label(self.dashboard_frame, text=f"TV: {self.tv_status}", font=("Helvetica", 11), fg=self.current_theme["frame_fg"], bg=self.current_theme["frame_bg"])
-        self.tv_status_label.grid(row=0, column=3, padx=15, pady=8, sticky='w')
-        self.stove_status_label = tk.Label(self.dashboard_frame, text=f"Bếp: {self.stove_status}", font=("Helvetica", 11), fg=self.current_theme["frame_fg"], bg=self.current_theme["frame_bg"])
-        self.stove_status_label.grid(row=0, column=4, padx=15, pady=8, sticky='w')
+        self.dashboard_frame.grid_columnconfigure(0, weight=1)
+        self.status_label = tk.Label(self.dashboard_frame, text="", font=("Helvetica", 11), fg=self.current_theme["frame_fg"], bg=self.current_theme["frame_bg"], wraplength=520, justify=tk.LEFT)
+        self.status_label.grid(row=0, column=0, padx=15, pady=8, sticky='w')
+        self.stats_label = tk.Label(self.dashboard_frame, text="", font=("Helvetica", 10), fg=self.current_theme["frame_fg"], bg=self.current_theme["frame_bg"])
+        self.stats_label.grid(row=1, column=0, padx=15, pady=(0, 4), sticky='w')
+        self.update_status_label()
         self.control_frame = tk.Frame(self.right_pane, bg=self.current_theme["frame_bg"], bd=2, relief=tk.GROOVE, padx=20, pady=10)
         self.control_frame.pack(fill=tk.X, pady=10)
-        # LED Control
-        self.led_frame = tk.Frame(self.control_frame, bg=self.current_theme["frame_bg"])
-        self.led_frame.pack(fill=tk.X, pady=5)
-        if self.icons["led"]:
-            tk.Label(self.led_frame, image=self.icons["led"], bg=self.current_theme["frame_bg"]).pack(side=tk.LEFT, padx=5)
-        tk.Label(self.led_frame, text="LED", font=("Helvetica", 12, "bold"), bg=self.current_theme["frame_bg"], fg=self.current_theme["frame_fg"]).pack(side=tk.LEFT, padx=5)
-        self.led_toggle = ToggleSwitch(self.led_frame, self.toggle_led, bg=self.current_theme["canvas_bg"])
-        self.led_toggle.pack(side=tk.LEFT, padx=5)
-        # Fan Control
-        self.fan_frame = tk.Frame(self.control_frame, bg=self.current_theme["frame_bg"])
-        self.fan_frame.pack(fill=tk.X, pady=5)
-        if self.icons["fan"]:
-            tk.Label(self.fan_frame, image=self.icons["fan"], bg=self.current_theme["frame_bg"]).pack(side=tk.LEFT, padx=5)
-        tk.Label(self.fan_frame, text="Quạt", font=("Helvetica", 12, "bold"), bg=self.current_theme["frame_bg"], fg=self.current_theme["frame_fg"]).pack(side=tk.LEFT, padx=5)
-        self.fan_toggle = ToggleSwitch(self.fan_frame, self.toggle_fan, bg=self.current_theme["canvas_bg"])
-        self.fan_toggle.pack(side=tk.LEFT, padx=5)
-        # AC Control
-        self.ac_frame = tk.Frame(self.control_frame, bg=self.current_theme["frame_bg"])
-        self.ac_frame.pack(fill=tk.X, pady=5)
-        if self.icons["ac"]:
-            tk.Label(self.ac_frame, image=self.icons["ac"], bg=self.current_theme["frame_bg"]).pack(side=tk.LEFT, padx=5)
-        tk.Label(self.ac_frame, text="Điều hòa", font=("Helvetica", 12, "bold"), bg=self.current_theme["frame_bg"], fg=self.current_theme["frame_fg"]).pack(side=tk.LEFT, padx=5)
-        self.ac_toggle = ToggleSwitch(self.ac_frame, self.toggle_ac, bg=self.current_theme["canvas_bg"])
-        self.ac_toggle.pack(side=tk.LEFT, padx=5)
-        # TV Control
-        self.tv_frame = tk.Frame(self.control_frame, bg=self.current_theme["frame_bg"])
-        self.tv_frame.pack(fill=tk.X, pady=5)
-        if self.icons["tv"]:
-            tk.Label(self.tv_frame, image=self.icons["tv"], bg=self.current_theme["frame_bg"]).pack(side=tk.LEFT, padx=5)
-        tk.Label(self.tv_frame, text="TV", font=("Helvetica", 12, "bold"), bg=self.current_theme["frame_bg"], fg=self.current_theme["frame_fg"]).pack(side=tk.LEFT, padx=5)
-        self.tv_toggle = ToggleSwitch(self.tv_frame, self.toggle_tv, bg=self.current_theme["canvas_bg"])
-        self.tv_toggle.pack(side=tk.LEFT, padx=5)
-        # Stove Control
-        self.stove_frame = tk.Frame(self.control_frame, bg=self.current_theme["frame_bg"])
-        self.stove_frame.pack(fill=tk.X, pady=5)
-        if self.icons["stove"]:
-            tk.Label(self.stove_frame, image=self.icons["stove"], bg=self.current_theme["frame_bg"]).pack(side=tk.LEFT, padx=5)
-        tk.Label(self.stove_frame, text="Bếp", font=("Helvetica", 12, "bold"), bg=self.current_theme["frame_bg"], fg=self.current_theme["frame_fg"]).pack(side=tk.LEFT, padx=5)
-        self.stove_toggle = ToggleSwitch(self.stove_frame, self.toggle_stove, bg=self.current_theme["canvas_bg"])
-        self.stove_toggle.pack(side=tk.LEFT, padx=5)
+        self.device_list = DeviceListView(self.control_frame, self.registry, self.store, self.icons, self.on_device_toggled, self.current_theme)
+        self.device_list.pack(fill=tk.X)
         self.notification = tk.Label(self.right_pane, text="Đang nghe...", font=("Helvetica", 12), fg=self.current_theme["error_fg"], bg=self.current_theme["bg"], pady=5)
         self.notification.pack(side=tk.BOTTOM, fill=tk.X)
+        # Ảnh camera hiển thị ngay trong cửa sổ, tốc độ vẽ độc lập với tốc độ nhận diện
+        self.preview = FramePreview(self.root, self.right_pane, preview_fps=self.preview_fps)
+        self.preview.canvas.pack(fill=tk.BOTH, expand=True, pady=(0, 5))
+
+    def on_destroy(self, event):
+        if event.widget is self.root:
+            self.closing.set()
+
+    def on_device_toggled(self, index, state):
+        # Bật/tắt bằng tay trên giao diện
+        self.store.set(index, state)
+        self.flush_device_changes(default_source="manual")
 
-    def toggle_led(self, state):
-        self.led_status = "ON" if state else "OFF"
-        self.led_status_label.config(text=f"LED: {self.led_status}")
-        self.notification.config(text=f"LED: {self.led_status}")
-    def toggle_fan(self, state):
-        self.fan_status = "ON" if state else "OFF"
-        self.fan_status_label.config(text=f"Quạt: {self.fan_status}")
-        self.notification.config(text=f"Quạt: {self.fan_status}")
-    def toggle_ac(self, state):
-        self.ac_status = "ON" if state else "OFF"
-        self.ac_status_label.config(text=f"Điều hòa: {self.ac_status}")
-        self.notification.config(text=f"Điều hòa: {self.ac_status}")
-    def toggle_tv(self, state):
-        self.tv_status = "ON" if state else "OFF"
-        self.tv_status_label.config(text=f"TV: {self.tv_status}")
-        self.notification.config(text=f"TV: {self.tv_status}")
-    def toggle_stove(self, state):
-        self.stove_status = "ON" if state else "OFF"
-        self.stove_status_label.config(text=f"Bếp: {self.stove_status}")
-        self.notification.config(text=f"Bếp: {self.stove_status}")
+    def flush_device_changes(self, sources=None, default_source="gesture"):
+        changed = self.store.take_dirty()
+        if not changed:
+            return
+        self.device_list.refresh(changed)
+        self.update_status_label()
+        for i in changed:
+            device = self.registry[i]
+            state = self.store.get(i)
+            self.dispatch_device(device.id, state)
+            source = sources.get(device.id, default_source) if sources else default_source
+            if self.journal is not None:
+                # Store chỉ đánh dấu dirty khi trạng thái thật sự đổi nên trạng thái cũ là ngược lại
+                self.journal.device(device.id, not state, state, source)
+            for listener in self.state_listeners:
+                try:
+                    listener(device.id, state, source)
+                except Exception as e:
+                    # Một listener lỗi không được chặn việc gửi lệnh và ghi nhật ký các thiết bị còn lại
+                    print(f"Lỗi state listener {listener!r}: {e!r}")
+        last = self.registry[changed[-1]]
+        self.notification.config(text=f"{last.label}: {'ON' if self.store.get(changed[-1]) else 'OFF'}")
+
+    def update_status_label(self):
+        on = [d.label for i, d in enumerate(self.registry) if self.store.get(i)]
+        text = f"Đang bật ({len(on)}/{len(self.registry)}): {', '.join(on) if on else 'không có'}"
+        self.status_label.config(text=text)
+
+    def dispatch_device(self, name, state):
+        if self.dispatcher is not None:
+            self.dispatcher.send(name, state)
     def apply_theme(self):
         theme = self.light_theme
         self.root.configure(bg=theme["bg"])
@@ -353,17 +383,38 @@ class SmartHomeApp:
             self.left_pane.configure(bg=theme["bg"])
 
     # Thêm hàm để cập nhật trạng thái thiết bị từ bên ngoài (main.py)
-    def set_device_states(self, led, tv, fan, stove, ac):
-        self.led_toggle.set_state(led)
-        self.tv_toggle.set_state(tv)
-        self.fan_toggle.set_state(fan)
-        self.stove_toggle.set_state(stove)
-        self.ac_toggle.set_state(ac)
-        self.toggle_led(led)
-        self.toggle_tv(tv)
-        self.toggle_fan(fan)
-        self.toggle_stove(stove)
-        self.toggle_ac(ac)
+    # Chỉ gọi trên luồng Tk; luồng khác dùng self.device_bus.publish({device_id: state hoặc TOGGLE})
+    def get_device_states(self):
+        return {d.id: self.store.get(i) for i, d in enumerate(self.registry)}
+
+    def apply_device_states(self, states, sources=None):
+        # Store chỉ đánh dấu dirty các thiết bị thực sự đổi; chỉ các hàng đó được vẽ lại
+        for device_id, state in states.items():
+            i = self.registry.index.get(device_id)
+            if i is not None:
+                if state == TOGGLE:
+                    state = not self.store.get(i)
+                self.store.set(i, state)
+        self.flush_device_changes(sources)
+
+    # Hiển thị FPS/độ trễ của vòng lặp nhận diện (stats: metrics.Instrumentation)
+    def attach_stats(self, stats, interval_ms=1000):
+        self.stats = stats
+        self.stats_interval_ms = interval_ms
+        self.root.after(interval_ms, self.update_stats_label)
+
+    def update_stats_label(self):
+        self.stats_label.config(text=self.stats.summary_text())
+        self.root.after(self.stats_interval_ms, self.update_stats_label)
+
+    def pump_device_states(self):
+        states, sources = self.device_bus.drain()
+        if states:
+            self.apply_device_states(states, sources)
+        message = self.device_bus.take_message()
+        if message is not None:
+            self.notification.config(text=message)
+        self.root.after(self.device_pump_ms, self.pump_device_states)
 
 if __name__ == "__main__":
     root = tk.Tk()